@@ -1,27 +1,67 @@
 """
 API endpoints for job management
 """
+import asyncio
+import hashlib
 import logging
-from fastapi import APIRouter, UploadFile, File, HTTPException, BackgroundTasks, Form
-from fastapi.responses import FileResponse
+import orjson
+import os
+from fastapi import APIRouter, UploadFile, File, HTTPException, Form, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import FileResponse, ORJSONResponse, Response, StreamingResponse
 from pathlib import Path
-from typing import Optional
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional, BinaryIO, Dict, Iterator, Set, Tuple
 from core.models import Job, JobStatus, VideoValidation
-from core.config import get_settings, QualityPreset, QUALITY_PRESETS
-from core.pipeline import process_job
+from core.config import get_settings, get_preset_config, QualityPreset
 from jobs.job_manager import get_job_manager
-from services.video.validate import validate_video, get_video_info
-import aiofiles
+from jobs.queue import get_job_queue
+from services.video.validate import validate_video_async, get_video_info
+from starlette.concurrency import run_in_threadpool
 import uuid
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 settings = get_settings()
+job_manager = get_job_manager()
+
+# Read uploads in 1 MiB chunks to keep memory bounded per request
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+# Precompressed model copies in order of preference: (Content-Encoding, suffix)
+_PRECOMPRESSED_ENCODINGS = (("zstd", ".zst"), ("gzip", ".gz"))
+
+# Returned by _parse_range when the requested range lies outside the file
+_UNSATISFIABLE_RANGE = (-1, -1)
+
+# Status payloads kept in memory; the least recently polled are dropped first
+STATUS_CACHE_SIZE = 1024
+# Status payloads keyed by job_id, valid while job.updated_at is unchanged
+_status_cache: "OrderedDict[str, Tuple[datetime, dict]]" = OrderedDict()
+
+
+def _save_upload(src: BinaryIO, dest: Path, max_size: int) -> Optional[str]:
+    """
+    Copy an uploaded file stream to disk with blocking writes, hashing it on the way.
+    
+    Returns:
+        SHA-256 hex digest of the content, or None if the stream exceeded
+        max_size (copy is aborted)
+    """
+    digest = hashlib.sha256()
+    total_bytes = 0
+    with open(dest, 'wb') as out:
+        while chunk := src.read(UPLOAD_CHUNK_SIZE):
+            total_bytes += len(chunk)
+            if total_bytes > max_size:
+                return None
+            digest.update(chunk)
+            out.write(chunk)
+    return digest.hexdigest()
 
 
 @router.post("/upload")
 async def upload_video(
-    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     quality_preset: str = Form(default="balanced")
 ):
@@ -39,18 +79,17 @@ async def upload_video(
         preset = QualityPreset.BALANCED
         logger.warning(f"Invalid preset '{quality_preset}', using balanced")
     
-    preset_config = QUALITY_PRESETS[preset]
+    preset_config = get_preset_config(preset)
     
     # Validate file extension
     file_ext = Path(file.filename).suffix.lower()
     if file_ext not in settings.ALLOWED_EXTENSIONS:
         raise HTTPException(
             status_code=400,
-            detail=f"Invalid file type. Allowed: {settings.ALLOWED_EXTENSIONS}"
+            detail=f"Invalid file type. Allowed: {settings.allowed_extensions_display}"
         )
     
     # Create job with preset
-    job_manager = get_job_manager()
     job = await job_manager.create_job(file.filename)
     job.quality_preset = preset
     job.estimated_minutes = preset_config.estimated_minutes
@@ -60,15 +99,54 @@ async def upload_video(
     video_path = settings.UPLOADS_DIR / video_filename
     
     try:
-        async with aiofiles.open(video_path, 'wb') as f:
-            content = await file.read()
-            await f.write(content)
+        # Stream the upload to disk in bounded chunks on the threadpool so
+        # memory stays flat and the event loop stays free
+        content_hash = await run_in_threadpool(
+            _save_upload, file.file, video_path, settings.MAX_UPLOAD_SIZE
+        )
+
+        if content_hash is None:
+            max_mb = settings.MAX_UPLOAD_SIZE / (1024 * 1024)
+            job.status = JobStatus.ERROR
+            job.error_message = f"File too large. Maximum: {max_mb:.0f}MB"
+            await job_manager.update_job(job)
+
+            # Delete partial upload
+            video_path.unlink(missing_ok=True)
+
+            raise HTTPException(status_code=413, detail=job.error_message)
+        
+        # The same video at the same preset yields the same model, so reuse it
+        existing = await job_manager.find_by_hash(content_hash, preset)
+        if existing:
+            video_path.unlink(missing_ok=True)
+            logger.info(f"Job {job.job_id} duplicates completed job {existing.job_id}, reusing its model")
+            await job_manager.patch_job(
+                job.job_id,
+                content_hash=content_hash,
+                status=JobStatus.COMPLETED,
+                progress=1.0,
+                validation=existing.validation,
+                model_filename=existing.model_filename,
+                model_url=existing.model_url,
+                model_url_compressed=existing.model_url_compressed
+            )
+            return {
+                "job_id": job.job_id,
+                "status": job.status,
+                "quality_preset": preset.value,
+                "estimated_minutes": 0,
+                "model_url": job.model_url,
+                "model_url_compressed": _compressed_url(job),
+                "message": "Video already processed. Reusing existing model."
+            }
         
         # Validate video
         job.status = JobStatus.VALIDATING
         await job_manager.update_job(job)
         
-        validation_result = validate_video(video_path)
+        # ffprobe is blocking; keep it off the event loop
+        validation_result = await validate_video_async(video_path)
         
         job.validation = VideoValidation(
             valid=validation_result.valid,
@@ -99,18 +177,19 @@ async def upload_video(
         
         # Update job with saved filename
         job.video_filename = video_filename
+        job.content_hash = content_hash
         job.status = JobStatus.UPLOADED
         await job_manager.update_job(job)
         
-        # Start background processing
-        background_tasks.add_task(process_job, job)
+        # Hand off to the job queue workers
+        await get_job_queue().enqueue(job.job_id)
         
         response = {
             "job_id": job.job_id,
             "status": job.status,
             "quality_preset": preset.value,
             "estimated_minutes": preset_config.estimated_minutes,
-            "message": "Video uploaded and validated. Processing started."
+            "message": "Video uploaded and validated. Processing queued."
         }
         
         if validation_result.warnings:
@@ -134,28 +213,37 @@ async def upload_video(
         await job_manager.update_job(job)
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
-@router.get("/{job_id}/status")
-async def get_job_status(job_id: str):
-    """
-    Get the current status of a job
+
+def _compressed_url(job: Job) -> Optional[str]:
     """
-    job_manager = get_job_manager()
-    job = await job_manager.get_job(job_id)
-    
-    if not job:
-        raise HTTPException(status_code=404, detail="Job not found")
+    URL of the job's gzip copy, if there is one yet
     
+    A job reusing another job's model (upload dedup) may copy its fields
+    before that job's post-processing has written the .gz, so fall back to
+    checking for the file itself.
+    """
+    if job.model_url_compressed:
+        return job.model_url_compressed
+    if job.status == JobStatus.COMPLETED and job.model_filename:
+        compressed_filename = job.model_filename + ".gz"
+        if (settings.MODELS_DIR / compressed_filename).exists():
+            return f"/static/models/{compressed_filename}"
+    return None
+
+
+def _build_status(job: Job) -> dict:
+    """Build the status payload for a job"""
     response = {
         "job_id": job.job_id,
         "status": job.status,
         "progress": job.progress,
         "error_message": job.error_message,
         "model_url": job.model_url,
-        "model_url_compressed": job.model_url_compressed,
+        "model_url_compressed": _compressed_url(job),
         "quality_preset": job.quality_preset.value if job.quality_preset else "balanced",
         "estimated_minutes": job.estimated_minutes,
-        "created_at": job.created_at.isoformat(),
-        "updated_at": job.updated_at.isoformat()
+        "created_at": job.created_at,
+        "updated_at": job.updated_at
     }
     
     if job.validation:
@@ -169,16 +257,108 @@ async def get_job_status(job_id: str):
     return response
 
 
+def _get_status(job: Job) -> dict:
+    """Return the cached status payload for a job, rebuilding it if stale"""
+    cached = _status_cache.get(job.job_id)
+    # A completed job's compressed copy can appear without a job update
+    # (see _compressed_url), so keep re-checking until it has one
+    if cached and cached[0] == job.updated_at and (
+        cached[1]["model_url_compressed"] or job.status != JobStatus.COMPLETED
+    ):
+        _status_cache.move_to_end(job.job_id)
+        return cached[1]
+    
+    response = _build_status(job)
+    _status_cache[job.job_id] = (job.updated_at, response)
+    _status_cache.move_to_end(job.job_id)
+    while len(_status_cache) > STATUS_CACHE_SIZE:
+        _status_cache.popitem(last=False)
+    return response
+
+
+@router.get("/{job_id}/status")
+async def get_job_status(job_id: str):
+    """
+    Get the current status of a job
+    
+    Clients poll this while a job runs, so the payload is cached per job and
+    only rebuilt after the job manager records an update.
+    """
+    job = await job_manager.get_job(job_id)
+    
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    # Returned as a Response so the cached payload goes straight to orjson
+    # instead of through FastAPI's jsonable_encoder
+    return ORJSONResponse(_get_status(job))
+
+
+@router.websocket("/{job_id}/ws")
+async def job_status_ws(websocket: WebSocket, job_id: str):
+    """
+    Push job status updates over a WebSocket
+    
+    Sends the current status on connect and again after every job update,
+    then closes once the job is completed or failed.
+    """
+    job = await job_manager.get_job(job_id)
+    
+    if not job:
+        await websocket.close(code=4404)
+        return
+    
+    await websocket.accept()
+    updates = job_manager.subscribe(job_id)
+    # Watch the client side so a closed browser tab releases the subscription
+    # without waiting for the next job update
+    receiver = asyncio.create_task(websocket.receive())
+    
+    try:
+        while True:
+            await websocket.send_text(orjson.dumps(_get_status(job)).decode())
+            if job.status in (JobStatus.COMPLETED, JobStatus.ERROR):
+                await websocket.close()
+                break
+            
+            update = asyncio.create_task(updates.get())
+            while True:
+                done, _ = await asyncio.wait(
+                    {update, receiver}, return_when=asyncio.FIRST_COMPLETED
+                )
+                if receiver not in done:
+                    break
+                if receiver.result()["type"] == "websocket.disconnect":
+                    update.cancel()
+                    return
+                # Ignore client messages and keep listening
+                receiver = asyncio.create_task(websocket.receive())
+            
+            job = await job_manager.get_job(job_id)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
+        job_manager.unsubscribe(job_id, updates)
+
+
 @router.get("/{job_id}/model")
-async def download_model(job_id: str, compressed: bool = False):
+async def download_model(request: Request, job_id: str, compressed: bool = False):
     """
     Download the generated model file
     
+    Without `compressed`, the PLY is content-negotiated: a precompressed
+    .zst or .gz copy is sent with a matching Content-Encoding when the
+    client's Accept-Encoding allows it, and the raw file otherwise. With
+    ACCEL_REDIRECT_PREFIX set the raw PLY is always redirected, since nginx
+    would send the encoded copy without its Content-Encoding.
+    Requests with a Range header always get byte ranges of the raw PLY so
+    viewers can seek into it.
+    
     Args:
         job_id: Job ID
         compressed: If true, download gzip-compressed version (smaller file)
     """
-    job_manager = get_job_manager()
     job = await job_manager.get_job(job_id)
     
     if not job:
@@ -198,10 +378,8 @@ async def download_model(job_id: str, compressed: bool = False):
         compressed_filename = job.model_filename + ".gz"
         compressed_path = settings.MODELS_DIR / compressed_filename
         if compressed_path.exists():
-            return FileResponse(
-                path=str(compressed_path),
-                filename=compressed_filename,
-                media_type="application/gzip"
+            return _model_file_response(
+                compressed_path, compressed_filename, "application/gzip"
             )
     
     model_path = settings.MODELS_DIR / job.model_filename
@@ -209,18 +387,164 @@ async def download_model(job_id: str, compressed: bool = False):
     if not model_path.exists():
         raise HTTPException(status_code=404, detail="Model file not found on disk")
     
+    range_header = request.headers.get("range")
+    if range_header:
+        return _model_file_response(
+            model_path, job.model_filename, "application/octet-stream",
+            headers={"Vary": "Accept-Encoding"}, range_header=range_header
+        )
+    
+    # nginx drops upstream Content-Encoding on X-Accel-Redirect responses,
+    # so behind the proxy only the raw PLY can be labelled correctly
+    accepted = (
+        set() if settings.ACCEL_REDIRECT_PREFIX
+        else _accepted_encodings(request.headers.get("accept-encoding", ""))
+    )
+    for encoding, suffix in _PRECOMPRESSED_ENCODINGS:
+        encoded_path = model_path.with_name(model_path.name + suffix)
+        if encoding in accepted and encoded_path.exists():
+            return _model_file_response(
+                encoded_path, job.model_filename, "application/octet-stream",
+                headers={"Content-Encoding": encoding, "Vary": "Accept-Encoding"}
+            )
+    
+    return _model_file_response(
+        model_path, job.model_filename, "application/octet-stream",
+        headers={"Vary": "Accept-Encoding"}
+    )
+
+
+def _accepted_encodings(accept_encoding: str) -> Set[str]:
+    """Parse an Accept-Encoding header into the set of acceptable codings"""
+    accepted = set()
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        if params.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        if coding:
+            accepted.add(coding.lower())
+    return accepted
+
+
+def _model_file_response(
+    path: Path,
+    filename: str,
+    media_type: str,
+    headers: Optional[Dict[str, str]] = None,
+    range_header: Optional[str] = None
+) -> Response:
+    """
+    Serve a file from MODELS_DIR.
+    
+    When ACCEL_REDIRECT_PREFIX is set, the body is left to the reverse proxy
+    (nginx X-Accel-Redirect), which sends the file straight from disk and
+    handles Range requests itself. Otherwise a single byte range is answered
+    with 206 Partial Content and the whole file with FileResponse.
+    """
+    if settings.ACCEL_REDIRECT_PREFIX:
+        relative_path = path.relative_to(settings.MODELS_DIR).as_posix()
+        internal_path = f"{settings.ACCEL_REDIRECT_PREFIX.rstrip('/')}/{relative_path}"
+        return Response(
+            media_type=media_type,
+            headers={
+                **(headers or {}),
+                "X-Accel-Redirect": internal_path,
+                "Content-Disposition": f'attachment; filename="{filename}"',
+            }
+        )
+    
+    stat_result = os.stat(path)
+    headers = {**(headers or {})}
+    # Range requests are always answered from the raw PLY, so byte offsets
+    # into an encoded copy must not be advertised
+    headers["Accept-Ranges"] = "none" if "Content-Encoding" in headers else "bytes"
+    
+    if range_header:
+        byte_range = _parse_range(range_header, stat_result.st_size)
+        if byte_range == _UNSATISFIABLE_RANGE:
+            return Response(
+                status_code=416,
+                headers={"Content-Range": f"bytes */{stat_result.st_size}"}
+            )
+        if byte_range:
+            start, end = byte_range
+            return StreamingResponse(
+                _iter_file_range(path, start, end),
+                status_code=206,
+                media_type=media_type,
+                headers={
+                    **headers,
+                    "Content-Range": f"bytes {start}-{end}/{stat_result.st_size}",
+                    "Content-Length": str(end - start + 1),
+                    "Content-Disposition": f'attachment; filename="{filename}"',
+                }
+            )
+    
+    # Passing stat_result saves FileResponse its own stat call
     return FileResponse(
-        path=str(model_path),
-        filename=job.model_filename,
-        media_type="application/octet-stream"
+        path=str(path),
+        filename=filename,
+        media_type=media_type,
+        headers=headers,
+        stat_result=stat_result
     )
 
+
+def _parse_range(range_header: str, size: int):
+    """
+    Parse a single-range "bytes=" Range header.
+    
+    Returns:
+        (start, end) inclusive offsets, _UNSATISFIABLE_RANGE if the range lies
+        outside the file, or None if the header should be ignored (malformed
+        or multi-range), in which case the full file is served
+    """
+    unit, _, spec = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    
+    first, sep, last = spec.strip().partition("-")
+    if not sep:
+        return None
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
+        else:
+            # Suffix range: the last N bytes
+            suffix = int(last)
+            if suffix == 0:
+                return _UNSATISFIABLE_RANGE
+            start = max(size - suffix, 0)
+            end = size - 1
+    except ValueError:
+        return None
+    
+    if start >= size:
+        return _UNSATISFIABLE_RANGE
+    if start > end:
+        return None
+    return start, min(end, size - 1)
+
+
+def _iter_file_range(path: Path, start: int, end: int) -> Iterator[bytes]:
+    """Yield bytes start..end (inclusive) of a file in upload-sized chunks"""
+    remaining = end - start + 1
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while remaining > 0:
+            chunk = f.read(min(UPLOAD_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
 @router.get("/{job_id}/preview")
 async def get_preview_url(job_id: str):
     """
     Get the preview URL for the model
     """
-    job_manager = get_job_manager()
     job = await job_manager.get_job(job_id)
     
     if not job:
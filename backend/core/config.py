@@ -2,10 +2,11 @@
 Configuration settings for the application
 """
 from pathlib import Path
-from typing import List, Dict, Any
+from types import MappingProxyType
+from typing import FrozenSet, Literal, Mapping, Optional
 from pydantic_settings import BaseSettings
-from pydantic import BaseModel
-from functools import lru_cache
+from pydantic import BaseModel, ConfigDict, field_validator
+from functools import lru_cache, cached_property
 from enum import Enum
 
 
@@ -18,6 +19,8 @@ class QualityPreset(str, Enum):
 
 class PresetConfig(BaseModel):
     """Configuration for a quality preset"""
+    model_config = ConfigDict(frozen=True)
+    
     name: str
     description: str
     fps: float
@@ -27,8 +30,8 @@ class PresetConfig(BaseModel):
     estimated_minutes: int
 
 
-# Quality preset definitions
-QUALITY_PRESETS: Dict[QualityPreset, PresetConfig] = {
+# Quality preset definitions (read-only; shared by every request)
+QUALITY_PRESETS: Mapping[QualityPreset, PresetConfig] = MappingProxyType({
     QualityPreset.FAST: PresetConfig(
         name="Fast",
         description="Quick preview (~3-5 min). Lower quality, good for testing.",
@@ -56,7 +59,7 @@ QUALITY_PRESETS: Dict[QualityPreset, PresetConfig] = {
         init_frames_ratio=0.25,
         estimated_minutes=25
     ),
-}
+})
 
 
 class Settings(BaseSettings):
@@ -67,12 +70,26 @@ class Settings(BaseSettings):
     FRAMES_DIR: Path = STORAGE_DIR / "frames"
     MODELS_DIR: Path = STORAGE_DIR / "models"
     LOGS_DIR: Path = STORAGE_DIR / "logs"
+    # Compiled CUDA artifacts reused across training runs
+    CACHE_DIR: Path = STORAGE_DIR / "cache"
     
     # Default processing settings (used if no preset specified)
     DEFAULT_PRESET: QualityPreset = QualityPreset.BALANCED
     FRAME_EXTRACTION_FPS: float = 2.0
+    # "fps" decodes every frame and samples at the preset FPS; "keyframe" decodes
+    # only keyframes (much faster, but the frame count follows the video's GOP size)
+    FRAME_EXTRACTION_MODE: Literal["fps", "keyframe"] = "fps"
     LONGSPLAT_ITERATIONS: int = 5000
     LONGSPLAT_RESOLUTION: int = 1
+    # Threads linking frames into a LongSplat scene; 1 stages serially (e.g. on spinning disks)
+    FRAME_STAGING_WORKERS: int = 8
+    # How frames reach the scene: "link" (hardlink, then symlink) or "copy" for
+    # filesystems that reject links
+    LONGSPLAT_STAGE_MODE: Literal["link", "copy"] = "link"
+    # PyTorch allocator settings for the training process (empty to use PyTorch's defaults)
+    LONGSPLAT_CUDA_ALLOC_CONF: str = "expandable_segments:True,max_split_size_mb:256,garbage_collection_threshold:0.8"
+    # Write the full LongSplat output to training.log (the tail is always logged on failure)
+    LONGSPLAT_VERBOSE: bool = False
     
     # Video validation settings
     MIN_VIDEO_DURATION: float = 3.0  # Minimum 3 seconds
@@ -82,10 +99,44 @@ class Settings(BaseSettings):
     
     # API settings
     MAX_UPLOAD_SIZE: int = 500 * 1024 * 1024  # 500MB
-    ALLOWED_EXTENSIONS: List[str] = [".mp4", ".mov", ".avi", ".webm"]
+    ALLOWED_EXTENSIONS: FrozenSet[str] = frozenset({".mp4", ".mov", ".avi", ".webm"})
+    # Internal nginx location mapped to MODELS_DIR (e.g. "/internal/models").
+    # When set, model downloads are served via X-Accel-Redirect.
+    ACCEL_REDIRECT_PREFIX: Optional[str] = None
+    
+    # External tools; bare names are resolved to absolute paths at startup
+    FFMPEG_PATH: str = "ffmpeg"
+    FFPROBE_PATH: str = "ffprobe"
+    # ffmpeg -hwaccel method for decoding during frame extraction (e.g. "cuda");
+    # empty decodes on the CPU
+    FFMPEG_HWACCEL: str = ""
     
     # Compression settings
     COMPRESS_OUTPUT: bool = True
+    GZIP_LEVEL: int = 3
+    ZSTD_LEVEL: int = 19  # Used when the zstd CLI is installed
+    
+    # Logging settings
+    LOG_MAX_BYTES: int = 50 * 1024 * 1024  # Rotate app.log at 50MB
+    LOG_BACKUP_COUNT: int = 5
+    
+    # Job queue settings
+    JOBS_FLUSH_INTERVAL: float = 1.0  # Seconds between coalesced jobs.json writes
+    JOBS_LOG_COMPACT_ENTRIES: int = 1000  # Fold jobs.log.jsonl into jobs.json after this many appends
+    MAX_PERSISTED_JOBS: int = 500  # Older finished jobs move to jobs.archive.jsonl
+    MAX_CONCURRENT_JOBS: int = 2  # CPU-lane workers (extraction, export); training has its own GPU lane
+    MAX_CONCURRENT_TRAIN: int = 1  # GPU-lane workers; one LongSplat run fills an A40's VRAM
+    
+    @field_validator("ALLOWED_EXTENSIONS")
+    @classmethod
+    def _normalize_extensions(cls, extensions: FrozenSet[str]) -> FrozenSet[str]:
+        """Lowercase extensions so membership checks match normalized suffixes"""
+        return frozenset(ext.lower() for ext in extensions)
+    
+    @cached_property
+    def allowed_extensions_display(self) -> str:
+        """Allowed extensions rendered once for error messages"""
+        return ", ".join(sorted(self.ALLOWED_EXTENSIONS))
     
     class Config:
         env_file = ".env"
@@ -102,6 +153,6 @@ def get_settings() -> Settings:
     settings = Settings()
     # Create directories
     for dir_path in [settings.UPLOADS_DIR, settings.FRAMES_DIR, 
-                     settings.MODELS_DIR, settings.LOGS_DIR]:
+                     settings.MODELS_DIR, settings.LOGS_DIR, settings.CACHE_DIR]:
         dir_path.mkdir(parents=True, exist_ok=True)
     return settings
@@ -1,26 +1,65 @@
 """
 Logging configuration for the application
 """
+import atexit
 import logging
+import logging.handlers
+import queue
 import sys
 from pathlib import Path
+from typing import Optional
 from core.config import get_settings
 
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Background thread that writes queued records to the real handlers
+_listener: Optional[logging.handlers.QueueListener] = None
+
 def setup_logging():
     """Configure application logging"""
+    global _listener
+    if _listener is not None:
+        return
+    
     settings = get_settings()
     
     # Create logs directory if it doesn't exist
     settings.LOGS_DIR.mkdir(parents=True, exist_ok=True)
     
+    # The format doesn't use thread/process fields; skip collecting them per record
+    logging.logThreads = False
+    logging.logProcesses = False
+    logging.logMultiprocessing = False
+    
+    formatter = logging.Formatter(LOG_FORMAT)
+    # Size-capped so app.log can't grow unbounded on the volume shared with models
+    file_handler = logging.handlers.RotatingFileHandler(
+        settings.LOGS_DIR / 'app.log',
+        maxBytes=settings.LOG_MAX_BYTES,
+        backupCount=settings.LOG_BACKUP_COUNT,
+        delay=True
+    )
+    stream_handler = logging.StreamHandler(sys.stdout)
+    for handler in (file_handler, stream_handler):
+        handler.setFormatter(formatter)
+    
+    # Loggers only enqueue records; file and console writes happen on the
+    # listener thread so request handlers never block on log I/O
+    log_queue: queue.Queue = queue.Queue(-1)
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    # Renders message + traceback once; the listener's handlers add the prefix
+    queue_handler.setFormatter(logging.Formatter('%(message)s'))
+    
+    _listener = logging.handlers.QueueListener(
+        log_queue, file_handler, stream_handler, respect_handler_level=True
+    )
+    _listener.start()
+    atexit.register(_listener.stop)
+    
     # Configure root logger
     logging.basicConfig(
         level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler(settings.LOGS_DIR / 'app.log'),
-            logging.StreamHandler(sys.stdout)
-        ]
+        handlers=[queue_handler]
     )
     
     # Set specific loggers
@@ -47,6 +47,7 @@ class Job(BaseModel):
     quality_preset: QualityPreset = QualityPreset.BALANCED
     validation: Optional[VideoValidation] = None
     estimated_minutes: Optional[int] = None
+    content_hash: Optional[str] = None  # SHA-256 of the uploaded video
 
 
 class JobCreate(BaseModel):
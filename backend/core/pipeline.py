@@ -3,116 +3,165 @@ High-level orchestration of the processing pipeline
 """
 import asyncio
 import logging
+import shutil
 from pathlib import Path
 from typing import Optional
-from core.config import get_settings, QUALITY_PRESETS, QualityPreset
+from core.config import get_settings, get_preset_config, QualityPreset
 from core.models import Job, JobStatus
 from jobs.job_manager import get_job_manager
 from services.video.extract_frames import extract_frames
 from services.longsplat.train import train_longsplat
 from services.export.to_ply import export_to_ply
 from services.export.to_obj import export_to_obj
-from services.export.compress import compress_ply_gzip
+from services.export.compress import compress_ply_gzip, compress_ply_zstd
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
+job_manager = get_job_manager()
 
 
-async def process_job(job: Job) -> Job:
+def _preset_config(job: Job):
+    preset = job.quality_preset or QualityPreset.BALANCED
+    return preset, get_preset_config(preset)
+
+
+async def extract_stage(job: Job) -> Job:
+    """
+    CPU stage: extract frames from the uploaded video using the preset FPS
+    """
+    preset, preset_config = _preset_config(job)
+    
+    logger.info(f"Processing job {job.job_id} with preset: {preset.value}")
+    logger.info(f"Preset config: FPS={preset_config.fps}, iterations={preset_config.iterations}, resolution={preset_config.resolution}")
+    
+    await job_manager.patch_job(job.job_id, status=JobStatus.EXTRACTING_FRAMES, progress=0.1)
+    
+    video_path = settings.UPLOADS_DIR / job.video_filename
+    frames_dir = settings.FRAMES_DIR / job.job_id
+    
+    logger.info(f"Extracting frames from {video_path} at {preset_config.fps} FPS")
+    await extract_frames(video_path, frames_dir, preset_config.fps, resolution=preset_config.resolution)
+    return job
+
+
+async def train_stage(job: Job) -> Job:
     """
-    Execute the full processing pipeline for a job
+    GPU stage: train LongSplat on the extracted frames
     """
-    try:
-        job_manager = get_job_manager()
-        
-        # Get preset configuration
-        preset = job.quality_preset or QualityPreset.BALANCED
-        preset_config = QUALITY_PRESETS[preset]
-        
-        logger.info(f"Processing job {job.job_id} with preset: {preset.value}")
-        logger.info(f"Preset config: FPS={preset_config.fps}, iterations={preset_config.iterations}, resolution={preset_config.resolution}")
-        
-        # Update job status
-        job.status = JobStatus.EXTRACTING_FRAMES
-        job.progress = 0.1
-        await job_manager.update_job(job)
-        
-        # Step 1: Extract frames using preset FPS
-        video_path = settings.UPLOADS_DIR / job.video_filename
-        frames_dir = settings.FRAMES_DIR / job.job_id
-        
-        logger.info(f"Extracting frames from {video_path} at {preset_config.fps} FPS")
-        frames_dir = await extract_frames(video_path, frames_dir, preset_config.fps)
-        
-        job.status = JobStatus.TRAINING
-        job.progress = 0.3
-        await job_manager.update_job(job)
-        
-        # Step 2: Train LongSplat with preset settings
-        logger.info(f"Training LongSplat model for job {job.job_id}")
-        longsplat_output_dir = settings.MODELS_DIR / job.job_id
-        longsplat_output_dir.mkdir(parents=True, exist_ok=True)
-        
-        training_success = await train_longsplat(
-            frames_dir, 
-            longsplat_output_dir,
-            iterations=preset_config.iterations,
-            resolution=preset_config.resolution
+    _, preset_config = _preset_config(job)
+    
+    await job_manager.patch_job(job.job_id, status=JobStatus.TRAINING, progress=0.3)
+    
+    logger.info(f"Training LongSplat model for job {job.job_id}")
+    frames_dir = settings.FRAMES_DIR / job.job_id
+    longsplat_output_dir = settings.MODELS_DIR / job.job_id
+    longsplat_output_dir.mkdir(parents=True, exist_ok=True)
+    
+    # Frames were already downscaled to the preset resolution when extracted
+    training_success = await train_longsplat(
+        frames_dir, 
+        longsplat_output_dir,
+        iterations=preset_config.iterations,
+        resolution=1
+    )
+    
+    if not training_success:
+        raise Exception("LongSplat training failed. Check logs for details.")
+    return job
+
+
+async def export_stage(job: Job) -> Job:
+    """
+    CPU stage: export the trained model and mark the job completed
+    """
+    longsplat_output_dir = settings.MODELS_DIR / job.job_id
+    
+    await job_manager.patch_job(job.job_id, status=JobStatus.EXPORTING, progress=0.85)
+    
+    # LongSplat already generates PLY, just copy it
+    logger.info(f"Exporting model to PLY for job {job.job_id}")
+    ply_path = await export_to_ply(longsplat_output_dir, job.job_id)
+    
+    if not ply_path:
+        raise Exception("Failed to export PLY file")
+    
+    # The PLY is all a client needs, so publish it before post-processing
+    model_filename = ply_path.name
+    await job_manager.patch_job(
+        job.job_id,
+        status=JobStatus.COMPLETED,
+        progress=1.0,
+        model_filename=model_filename,
+        model_url=f"/static/models/{model_filename}"
+    )
+    
+    logger.info(f"Job {job.job_id} completed successfully")
+    return job
+
+
+async def postprocess_stage(job: Job) -> Job:
+    """
+    CPU stage: best-effort compressed copies and OBJ export for a completed job
+    
+    The steps are independent, so they run concurrently. Failures are only
+    logged; the job stays completed with its PLY.
+    """
+    longsplat_output_dir = settings.MODELS_DIR / job.job_id
+    ply_path = settings.MODELS_DIR / job.model_filename
+    
+    async def gzip_copy() -> str:
+        logger.info(f"Compressing model for job {job.job_id}")
+        compressed_path = await asyncio.to_thread(
+            compress_ply_gzip, ply_path, None, settings.GZIP_LEVEL
         )
-        
-        if not training_success:
-            raise Exception("LongSplat training failed. Check logs for details.")
-        
-        job.status = JobStatus.EXPORTING
-        job.progress = 0.85
-        await job_manager.update_job(job)
-        
-        # Step 3: Export to PLY (LongSplat already generates PLY, just copy it)
-        logger.info(f"Exporting model to PLY for job {job.job_id}")
-        ply_path = await export_to_ply(longsplat_output_dir, job.job_id)
-        
-        if not ply_path:
-            raise Exception("Failed to export PLY file")
-        
-        # Step 4: Compress the output
-        job.status = JobStatus.COMPRESSING
-        job.progress = 0.92
-        await job_manager.update_job(job)
-        
-        if settings.COMPRESS_OUTPUT:
-            logger.info(f"Compressing model for job {job.job_id}")
-            try:
-                compressed_path = await asyncio.get_event_loop().run_in_executor(
-                    None, compress_ply_gzip, ply_path
-                )
-                job.model_url_compressed = f"/static/models/{job.job_id}.ply.gz"
-                logger.info(f"Compressed model saved to {compressed_path}")
-            except Exception as e:
-                logger.warning(f"Compression failed (optional): {e}")
-        
-        # Step 5: Optionally export to OBJ (experimental)
-        job.progress = 0.95
-        await job_manager.update_job(job)
-        
-        try:
-            obj_path = await export_to_obj(ply_path, longsplat_output_dir / f"{job.job_id}.obj")
-            logger.info(f"Exported OBJ to {obj_path}")
-        except Exception as e:
-            logger.warning(f"OBJ export failed (optional): {e}")
-        
-        # Finalize job
-        job.status = JobStatus.COMPLETED
-        job.progress = 1.0
-        job.model_filename = f"{job.job_id}.ply"
-        job.model_url = f"/static/models/{job.model_filename}"
-        await job_manager.update_job(job)
-        
-        logger.info(f"Job {job.job_id} completed successfully")
-        return job
-        
-    except Exception as e:
-        logger.error(f"Error processing job {job.job_id}: {e}", exc_info=True)
-        job.status = JobStatus.ERROR
-        job.error_message = str(e)
-        await job_manager.update_job(job)
-        return job
+        if compressed_path == ply_path:
+            raise Exception("gzip compression failed")
+        logger.info(f"Compressed model saved to {compressed_path}")
+        return f"/static/models/{compressed_path.name}"
+    
+    async def zstd_copy():
+        # zstd copy is served to clients that accept it (see download_model)
+        zstd_path = await compress_ply_zstd(ply_path, level=settings.ZSTD_LEVEL)
+        logger.info(f"zstd model saved to {zstd_path}")
+    
+    async def obj_copy():
+        # Experimental
+        obj_path = await export_to_obj(ply_path, longsplat_output_dir / f"{job.job_id}.obj")
+        logger.info(f"Exported OBJ to {obj_path}")
+    
+    steps = {"OBJ export": obj_copy()}
+    if settings.COMPRESS_OUTPUT:
+        steps["Compression"] = gzip_copy()
+        if shutil.which("zstd"):
+            steps["zstd compression"] = zstd_copy()
+    
+    results = dict(zip(steps, await asyncio.gather(*steps.values(), return_exceptions=True)))
+    for name, result in results.items():
+        if isinstance(result, Exception):
+            logger.warning(f"{name} failed (optional): {result}")
+    
+    model_url_compressed = results.get("Compression")
+    if isinstance(model_url_compressed, str):
+        await job_manager.patch_job(job.job_id, model_url_compressed=model_url_compressed)
+    return job
+
+
+# Stages in pipeline order, tagged with the worker lane that runs them
+CPU_LANE = "cpu"
+GPU_LANE = "gpu"
+PIPELINE_STAGES = (
+    (CPU_LANE, extract_stage),
+    (GPU_LANE, train_stage),
+    (CPU_LANE, export_stage),
+    (CPU_LANE, postprocess_stage),
+)
+
+
+async def fail_job(job: Job, error: Exception) -> Job:
+    """
+    Mark a job as failed
+    """
+    logger.error(f"Error processing job {job.job_id}: {error}", exc_info=error)
+    await job_manager.patch_job(job.job_id, status=JobStatus.ERROR, error_message=str(error))
+    return job
+
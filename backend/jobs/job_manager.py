@@ -1,66 +1,238 @@
 """
 Job state management and storage
 """
-import json
+import asyncio
 import logging
+import orjson
+import os
+import time
+import uuid
 from datetime import datetime
 from pathlib import Path
-from typing import Optional, Dict
+from typing import Optional, Dict, List, Set, Tuple
 from core.models import Job, JobStatus, VideoValidation
 from core.config import get_settings, QualityPreset
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
+# Updates to these statuses are written to disk immediately
+TERMINAL_STATUSES = frozenset({JobStatus.COMPLETED, JobStatus.ERROR})
+
+
+def _new_job_id() -> str:
+    """
+    Mint a UUIDv7 (RFC 9562) job ID.
+    
+    The leading 48 bits are the Unix time in milliseconds, so IDs sort by
+    creation time and jobs created together stay adjacent in sorted listings.
+    """
+    unix_ms = time.time_ns() // 1_000_000
+    rand = int.from_bytes(os.urandom(10), "big")
+    value = (
+        (unix_ms & 0xFFFF_FFFF_FFFF) << 80
+        | 0x7 << 76                         # version
+        | (rand >> 68) << 64                # rand_a (12 bits)
+        | 0b10 << 62                        # variant
+        | (rand & 0x3FFF_FFFF_FFFF_FFFF)    # rand_b (62 bits)
+    )
+    return str(uuid.UUID(int=value))
+
+
 class JobManager:
-    """Manages job state persistence"""
+    """
+    Manages job state persistence
+    
+    The in-memory jobs are the source of truth. On disk, jobs.json is a
+    snapshot and jobs.log.jsonl an append-only log of job states written
+    since that snapshot; loading replays the log over the snapshot.
+    
+    Updates mark a job pending; a background task appends pending jobs to
+    the log at most once per JOBS_FLUSH_INTERVAL, so a burst of progress
+    updates costs one small append. Terminal updates are written at once.
+    Once the log holds JOBS_LOG_COMPACT_ENTRIES entries it is compacted into
+    a fresh snapshot.
+    """
     
     def __init__(self):
         self.jobs: Dict[str, Job] = {}
+        # model_dump() of each job as of its last update, so a save only
+        # re-serializes the jobs that changed
+        self._serialized: Dict[str, dict] = {}
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._pending: Set[str] = set()  # Job IDs changed since the last write
+        self._log_entries = 0
+        self._flush_task: Optional[asyncio.Task] = None
+        # Serializes saves so an older snapshot never overwrites a newer one
+        self._save_lock = asyncio.Lock()
         self.jobs_file = settings.LOGS_DIR / "jobs.json"
+        self.log_file = settings.LOGS_DIR / "jobs.log.jsonl"
+        self.archive_file = settings.LOGS_DIR / "jobs.archive.jsonl"
+        # Archived jobs are looked up on demand rather than kept in memory:
+        # job_id -> byte offset of its record in the archive, and
+        # (content_hash, preset) -> job_id for dedup. Built on first use and
+        # rebuilt after the next archive write.
+        self._archive_offsets: Optional[Dict[str, int]] = None
+        self._archive_hashes: Dict[Tuple[str, str], str] = {}
         self._load_jobs()
     
     def _load_jobs(self):
-        """Load jobs from disk"""
+        """Load jobs from the snapshot, then replay the change log over it"""
+        records: Dict[str, dict] = {}
         if self.jobs_file.exists():
             try:
-                with open(self.jobs_file, 'r') as f:
-                    data = json.load(f)
-                    for job_id, job_data in data.items():
-                        job_data['status'] = JobStatus(job_data['status'])
-                        job_data['created_at'] = datetime.fromisoformat(job_data['created_at'])
-                        job_data['updated_at'] = datetime.fromisoformat(job_data['updated_at'])
-                        
-                        # Handle quality_preset
-                        if 'quality_preset' in job_data and job_data['quality_preset']:
-                            try:
-                                job_data['quality_preset'] = QualityPreset(job_data['quality_preset'])
-                            except ValueError:
-                                job_data['quality_preset'] = QualityPreset.BALANCED
-                        
-                        # Handle validation
-                        if 'validation' in job_data and job_data['validation']:
-                            job_data['validation'] = VideoValidation(**job_data['validation'])
-                        
-                        self.jobs[job_id] = Job(**job_data)
+                records.update(orjson.loads(self.jobs_file.read_bytes()))
             except Exception as e:
                 logger.warning(f"Failed to load jobs: {e}")
+        
+        if self.log_file.exists():
+            try:
+                with open(self.log_file, 'rb') as f:
+                    for line in f:
+                        try:
+                            job_data = orjson.loads(line)
+                        except orjson.JSONDecodeError:
+                            # Torn final line from a crash mid-append
+                            logger.warning("Skipping unreadable job log entry")
+                            continue
+                        self._log_entries += 1
+                        # Last write wins, unless the snapshot is already newer
+                        current = records.get(job_data['job_id'])
+                        if current is None or job_data['updated_at'] >= current['updated_at']:
+                            records[job_data['job_id']] = job_data
+            except Exception as e:
+                logger.warning(f"Failed to replay job log: {e}")
+        
+        for job_id, job_data in records.items():
+            try:
+                job = self._job_from_record(job_data)
+            except Exception as e:
+                logger.warning(f"Failed to load job {job_id}: {e}")
+                continue
+            self.jobs[job_id] = job
+            self._serialized[job_id] = job.model_dump()
     
-    def _save_jobs(self):
-        """Save jobs to disk"""
-        try:
-            data = {}
-            for job_id, job in self.jobs.items():
-                data[job_id] = job.model_dump(mode='json')
-            with open(self.jobs_file, 'w') as f:
-                json.dump(data, f, indent=2, default=str)
-        except Exception as e:
-            logger.error(f"Failed to save jobs: {e}")
+    @staticmethod
+    def _job_from_record(job_data: dict) -> Job:
+        """Build a Job from its persisted JSON form"""
+        job_data['status'] = JobStatus(job_data['status'])
+        job_data['created_at'] = datetime.fromisoformat(job_data['created_at'])
+        job_data['updated_at'] = datetime.fromisoformat(job_data['updated_at'])
+        
+        # Handle quality_preset
+        if 'quality_preset' in job_data and job_data['quality_preset']:
+            try:
+                job_data['quality_preset'] = QualityPreset(job_data['quality_preset'])
+            except ValueError:
+                job_data['quality_preset'] = QualityPreset.BALANCED
+        
+        # Handle validation
+        if 'validation' in job_data and job_data['validation']:
+            job_data['validation'] = VideoValidation.model_construct(**job_data['validation'])
+        
+        # Records are only written by this class and the fields are converted
+        # above, so skip re-validating every stored job
+        return Job.model_construct(**job_data)
+    
+    async def _save_jobs(self, compact: bool = False):
+        """
+        Write pending job changes to disk
+        
+        Args:
+            compact: Rewrite the snapshot and truncate the log even if the
+                log is below JOBS_LOG_COMPACT_ENTRIES
+        """
+        async with self._save_lock:
+            pending, self._pending = self._pending, set()
+            try:
+                # Snapshot on the event loop, where jobs are mutated; only the
+                # encoding and file I/O move to a worker thread. Entries are
+                # replaced, never mutated, so references stay stable.
+                entries = [self._serialized[job_id] for job_id in pending if job_id in self._serialized]
+                if compact or self._log_entries + len(entries) >= settings.JOBS_LOG_COMPACT_ENTRIES:
+                    evicted = {job.job_id for job in self._jobs_to_evict()}
+                    archived = [self._serialized[job_id] for job_id in evicted]
+                    data = {job_id: entry for job_id, entry in self._serialized.items() if job_id not in evicted}
+                    await asyncio.to_thread(self._write_snapshot, data, archived)
+                    # Only forget evicted jobs once they are safely archived
+                    for job_id in evicted:
+                        self.jobs.pop(job_id, None)
+                        self._serialized.pop(job_id, None)
+                    if evicted:
+                        self._archive_offsets = None
+                        logger.info(f"Archived {len(evicted)} old job(s) to {self.archive_file.name}")
+                    self._log_entries = 0
+                elif entries:
+                    await asyncio.to_thread(self._append_log, entries)
+                    self._log_entries += len(entries)
+            except Exception as e:
+                # Keep the changes dirty so the next flush retries them
+                self._pending |= pending
+                logger.error(f"Failed to save jobs: {e}")
+    
+    def _jobs_to_evict(self) -> List[Job]:
+        """
+        Pick the oldest finished jobs beyond MAX_PERSISTED_JOBS
+        
+        Evicting them keeps jobs.json, startup load time and memory bounded.
+        Jobs still in progress are never evicted. Evicted jobs stay reachable
+        through get_job and find_by_hash, which read them from the archive.
+        """
+        excess = len(self.jobs) - settings.MAX_PERSISTED_JOBS
+        if excess <= 0:
+            return []
+        finished = sorted(
+            (job for job in self.jobs.values() if job.status in TERMINAL_STATUSES),
+            key=lambda job: job.updated_at
+        )
+        return finished[:excess]
+    
+    def _append_log(self, entries: List[dict]):
+        """Append job states to the change log"""
+        with open(self.log_file, 'ab') as f:
+            f.write(b"".join(orjson.dumps(entry, option=orjson.OPT_APPEND_NEWLINE) for entry in entries))
+    
+    def _write_snapshot(self, data: dict, archived: List[dict]):
+        """Write a full jobs snapshot to jobs.json and start a new change log"""
+        if archived:
+            # Append-only, so archived history is never rewritten
+            with open(self.archive_file, 'ab') as f:
+                f.write(b"".join(orjson.dumps(job, option=orjson.OPT_APPEND_NEWLINE) for job in archived))
+        
+        # orjson encodes datetimes and enums natively from model_dump()
+        payload = orjson.dumps(data)
+        # Write a temp file and rename over jobs.json so a crash mid-write
+        # never leaves a truncated file behind
+        tmp_file = self.jobs_file.with_name(self.jobs_file.name + ".tmp")
+        tmp_file.write_bytes(payload)
+        os.replace(tmp_file, self.jobs_file)
+        # Everything in the log is now in the snapshot
+        open(self.log_file, 'wb').close()
+    
+    def _mark_dirty(self, job_id: str):
+        """Schedule a coalesced save on the background flusher"""
+        self._pending.add(job_id)
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_loop(), name="jobs-flush")
+    
+    async def _flush_loop(self):
+        """Write pending changes at most once per flush interval"""
+        while True:
+            await asyncio.sleep(settings.JOBS_FLUSH_INTERVAL)
+            if self._pending:
+                await self._save_jobs()
+    
+    async def close(self):
+        """Stop the background flusher and compact pending changes into the snapshot"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+            self._flush_task = None
+        await self._save_jobs(compact=True)
     
     async def create_job(self, video_filename: str) -> Job:
         """Create a new job"""
-        import uuid
-        job_id = str(uuid.uuid4())
+        job_id = _new_job_id()
         now = datetime.now()
         
         job = Job(
@@ -72,18 +244,135 @@ class JobManager:
         )
         
         self.jobs[job_id] = job
-        self._save_jobs()
+        self._serialized[job_id] = job.model_dump()
+        self._mark_dirty(job_id)
         return job
     
     async def get_job(self, job_id: str) -> Optional[Job]:
-        """Get a job by ID"""
-        return self.jobs.get(job_id)
+        """Get a job by ID, falling back to the archive for evicted jobs"""
+        job = self.jobs.get(job_id)
+        if job is None:
+            job = await self._get_archived_job(job_id)
+        return job
+    
+    async def find_by_hash(self, content_hash: str, quality_preset: QualityPreset) -> Optional[Job]:
+        """Find a completed job for the same video content and preset"""
+        for job in self.jobs.values():
+            if (
+                job.content_hash == content_hash
+                and job.quality_preset == quality_preset
+                and job.status == JobStatus.COMPLETED
+                and job.model_filename
+                and (settings.MODELS_DIR / job.model_filename).exists()
+            ):
+                return job
+        
+        await self._ensure_archive_index()
+        job_id = self._archive_hashes.get((content_hash, quality_preset.value))
+        job = await self._get_archived_job(job_id) if job_id else None
+        if job and job.model_filename and (settings.MODELS_DIR / job.model_filename).exists():
+            return job
+        return None
+    
+    async def _ensure_archive_index(self):
+        """Build the archive lookup index if it isn't current"""
+        if self._archive_offsets is None:
+            self._archive_offsets, self._archive_hashes = await asyncio.to_thread(self._read_archive_index)
+    
+    def _read_archive_index(self) -> Tuple[Dict[str, int], Dict[Tuple[str, str], str]]:
+        """Scan the archive for each job's latest record offset and completed jobs' hashes"""
+        offsets: Dict[str, int] = {}
+        hashes: Dict[Tuple[str, str], str] = {}
+        try:
+            with open(self.archive_file, 'rb') as f:
+                offset = 0
+                for line in f:
+                    try:
+                        record = orjson.loads(line)
+                        job_id = record['job_id']
+                    except (orjson.JSONDecodeError, KeyError, TypeError):
+                        offset += len(line)
+                        continue
+                    offsets[job_id] = offset
+                    if record.get('status') == JobStatus.COMPLETED.value and record.get('content_hash'):
+                        hashes[(record['content_hash'], record.get('quality_preset'))] = job_id
+                    offset += len(line)
+        except FileNotFoundError:
+            pass
+        return offsets, hashes
     
-    async def update_job(self, job: Job):
-        """Update a job"""
+    async def _get_archived_job(self, job_id: str) -> Optional[Job]:
+        """Load an evicted job from the archive; it is not brought back into memory"""
+        await self._ensure_archive_index()
+        offset = self._archive_offsets.get(job_id)
+        if offset is None:
+            return None
+        
+        def read_record() -> bytes:
+            with open(self.archive_file, 'rb') as f:
+                f.seek(offset)
+                return f.readline()
+        
+        try:
+            return self._job_from_record(orjson.loads(await asyncio.to_thread(read_record)))
+        except Exception as e:
+            logger.warning(f"Failed to load archived job {job_id}: {e}")
+            return None
+    
+    async def update_job(self, job: Job, flush: bool = False):
+        """
+        Update a job
+        
+        Args:
+            job: Job to store
+            flush: Write the change now instead of on the next flush
+                (always done for completed/failed jobs)
+        """
         job.updated_at = datetime.now()
         self.jobs[job.job_id] = job
-        self._save_jobs()
+        self._serialized[job.job_id] = job.model_dump()
+        if flush or job.status in TERMINAL_STATUSES:
+            self._pending.add(job.job_id)
+            await self._save_jobs()
+        else:
+            self._mark_dirty(job.job_id)
+        self._publish(job.job_id)
+    
+    async def patch_job(self, job_id: str, **fields) -> Optional[Job]:
+        """Apply several field changes to a job and persist them as one update"""
+        job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        for name, value in fields.items():
+            setattr(job, name, value)
+        await self.update_job(job)
+        return job
+    
+    def subscribe(self, job_id: str) -> asyncio.Queue:
+        """
+        Subscribe to updates for a job.
+        
+        The returned queue receives the job_id whenever the job is updated.
+        Notifications are coalesced: a subscriber that has not consumed the
+        previous one just reads the latest state when it catches up.
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+        self._subscribers.setdefault(job_id, set()).add(queue)
+        return queue
+    
+    def unsubscribe(self, job_id: str, queue: asyncio.Queue):
+        """Remove a subscription created by subscribe()"""
+        subscribers = self._subscribers.get(job_id)
+        if subscribers is not None:
+            subscribers.discard(queue)
+            if not subscribers:
+                del self._subscribers[job_id]
+    
+    def _publish(self, job_id: str):
+        """Notify subscribers that a job changed"""
+        for queue in self._subscribers.get(job_id, ()):
+            if queue.empty():
+                queue.put_nowait(job_id)
 
 # Global job manager instance
 _job_manager = None
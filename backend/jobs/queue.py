@@ -0,0 +1,104 @@
+"""
+In-process job queue that runs the processing pipeline on dedicated workers
+"""
+import asyncio
+import logging
+from typing import Dict, List
+from core.config import get_settings
+from core.pipeline import PIPELINE_STAGES, CPU_LANE, GPU_LANE, fail_job
+from jobs.job_manager import get_job_manager
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+class JobQueue:
+    """
+    Per-lane queues of pipeline stages consumed by fixed worker pools.
+
+    The API only enqueues the job ID and returns. Each job is split into the
+    stages in PIPELINE_STAGES: frame extraction and export run on the CPU lane,
+    training runs on the GPU lane, so CPU work for other jobs keeps flowing
+    while the GPU is busy. Workers reload the job from the job manager and
+    hand it to the next stage's lane when their stage succeeds.
+    """
+
+    def __init__(self, cpu_workers: int = 1, gpu_workers: int = 1):
+        self.lane_workers = {
+            CPU_LANE: max(1, cpu_workers),
+            GPU_LANE: max(1, gpu_workers),
+        }
+        self._queues: Dict[str, asyncio.Queue] = {}
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self):
+        """Start worker tasks on the running event loop"""
+        if self._tasks:
+            return
+        self._queues = {lane: asyncio.Queue() for lane in self.lane_workers}
+        self._tasks = [
+            asyncio.create_task(self._worker(lane, i), name=f"job-worker-{lane}-{i}")
+            for lane, count in self.lane_workers.items()
+            for i in range(count)
+        ]
+        logger.info(
+            "Started job workers: "
+            + ", ".join(f"{count} {lane}" for lane, count in self.lane_workers.items())
+        )
+
+    async def stop(self):
+        """Cancel worker tasks"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def enqueue(self, job_id: str):
+        """Queue a job for processing, starting at the first stage"""
+        if not self._queues:
+            self.start()
+        await self._put(job_id, 0)
+
+    async def _put(self, job_id: str, stage_index: int):
+        lane, stage = PIPELINE_STAGES[stage_index]
+        queue = self._queues[lane]
+        await queue.put((job_id, stage_index))
+        logger.info(f"Queued {stage.__name__} for job {job_id} on {lane} lane (depth: {queue.qsize()})")
+
+    async def _worker(self, lane: str, worker_id: int):
+        """Run queued stages for this lane one at a time"""
+        job_manager = get_job_manager()
+        queue = self._queues[lane]
+        while True:
+            job_id, stage_index = await queue.get()
+            _, stage = PIPELINE_STAGES[stage_index]
+            try:
+                job = await job_manager.get_job(job_id)
+                if job is None:
+                    logger.warning(f"Worker {lane}-{worker_id}: job {job_id} not found, skipping")
+                    continue
+                logger.info(f"Worker {lane}-{worker_id} running {stage.__name__} for job {job_id}")
+                try:
+                    await stage(job)
+                except Exception as e:
+                    await fail_job(job, e)
+                    continue
+                if stage_index + 1 < len(PIPELINE_STAGES):
+                    await self._put(job_id, stage_index + 1)
+            except Exception as e:
+                logger.error(f"Worker {lane}-{worker_id} failed on job {job_id}: {e}", exc_info=True)
+            finally:
+                queue.task_done()
+
+
+# Global job queue instance
+_job_queue = None
+
+def get_job_queue() -> JobQueue:
+    global _job_queue
+    if _job_queue is None:
+        _job_queue = JobQueue(
+            cpu_workers=settings.MAX_CONCURRENT_JOBS,
+            gpu_workers=settings.MAX_CONCURRENT_TRAIN
+        )
+    return _job_queue
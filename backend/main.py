@@ -1,19 +1,22 @@
 """
 FastAPI entrypoint for Gaussian Splatting Room Reconstruction MVP
 """
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, ORJSONResponse
 import os
 import logging
+import shutil
 from pathlib import Path
-from typing import List
+from typing import Dict, List
 
 from api.jobs import router as jobs_router
-from core.config import get_settings, QUALITY_PRESETS, QualityPreset
+from core.config import get_settings, QUALITY_PRESETS
 from core.models import PresetInfo
 from core.logging_config import setup_logging
+from jobs.job_manager import get_job_manager
+from jobs.queue import get_job_queue
 
 # Setup logging
 setup_logging()
@@ -21,7 +24,10 @@ logger = logging.getLogger(__name__)
 
 settings = get_settings()
 
-app = FastAPI(title="Gaussian Splatting Room Reconstruction API")
+app = FastAPI(
+    title="Gaussian Splatting Room Reconstruction API",
+    default_response_class=ORJSONResponse
+)
 
 # CORS middleware - allow all origins for production
 app.add_middleware(
@@ -44,6 +50,28 @@ models_path.mkdir(parents=True, exist_ok=True)
 app.mount("/static/models", StaticFiles(directory=str(models_path)), name="models")
 
 
+def _resolve_tool_paths():
+    """Resolve external tools on PATH once instead of on every subprocess spawn"""
+    for name in ("FFMPEG_PATH", "FFPROBE_PATH"):
+        resolved = shutil.which(getattr(settings, name))
+        if resolved:
+            setattr(settings, name, resolved)
+        else:
+            logger.warning(f"{name}={getattr(settings, name)} not found on PATH")
+
+
+@app.on_event("startup")
+async def startup():
+    _resolve_tool_paths()
+    get_job_queue().start()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await get_job_queue().stop()
+    await get_job_manager().close()
+
+
 @app.get("/")
 async def root():
     return {"message": "Gaussian Splatting Room Reconstruction API", "version": "0.2.0"}
@@ -54,35 +82,32 @@ async def health():
     return {"status": "healthy"}
 
 
+# Presets are static, so build their API models once at import
+_PRESETS: List[PresetInfo] = [
+    PresetInfo(
+        id=preset.value,
+        name=config.name,
+        description=config.description,
+        estimated_minutes=config.estimated_minutes
+    )
+    for preset, config in QUALITY_PRESETS.items()
+]
+_PRESET_BY_ID: Dict[str, PresetInfo] = {preset.id: preset for preset in _PRESETS}
+
+
 @app.get("/api/presets", response_model=List[PresetInfo], tags=["presets"])
 async def get_presets():
     """Get available quality presets"""
-    return [
-        PresetInfo(
-            id=preset.value,
-            name=config.name,
-            description=config.description,
-            estimated_minutes=config.estimated_minutes
-        )
-        for preset, config in QUALITY_PRESETS.items()
-    ]
+    return _PRESETS
 
 
 @app.get("/api/presets/{preset_id}", response_model=PresetInfo, tags=["presets"])
 async def get_preset(preset_id: str):
     """Get details for a specific preset"""
-    try:
-        preset = QualityPreset(preset_id)
-        config = QUALITY_PRESETS[preset]
-        return PresetInfo(
-            id=preset.value,
-            name=config.name,
-            description=config.description,
-            estimated_minutes=config.estimated_minutes
-        )
-    except ValueError:
-        from fastapi import HTTPException
+    preset = _PRESET_BY_ID.get(preset_id)
+    if preset is None:
         raise HTTPException(status_code=404, detail=f"Preset '{preset_id}' not found")
+    return preset
 
 
 if __name__ == "__main__":
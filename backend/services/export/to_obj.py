@@ -1,17 +1,25 @@
 """
 Convert PLY to OBJ format (optional/best-effort)
 """
+import asyncio
 import logging
 from pathlib import Path
+import numpy as np
+from plyfile import PlyData
+from utils.ply import as_xyz_view, open_vertices
 
 logger = logging.getLogger(__name__)
 
+# Vertices formatted per write; bounds the size of each formatted text block
+OBJ_CHUNK_VERTICES = 65536
+_OBJ_VERTEX_LINE = "v %.6f %.6f %.6f\n"
+
 async def export_to_obj(
     ply_path: Path,
     obj_path: Path
 ) -> Path:
     """
-    Convert PLY file to OBJ format
+    Convert PLY file to a point-cloud OBJ (one "v" line per vertex)
     
     Args:
         ply_path: Path to input PLY file
@@ -20,24 +28,31 @@ async def export_to_obj(
     Returns:
         Path to exported OBJ file
     """
+    # Formatting millions of vertices is CPU-bound; keep it off the event loop
+    return await asyncio.to_thread(_convert_to_obj, ply_path, obj_path)
+
+
+def _convert_to_obj(ply_path: Path, obj_path: Path) -> Path:
     try:
-        # Lazy import to avoid segfault issues
-        import trimesh
-        
-        # Load PLY file
-        mesh = trimesh.load(str(ply_path))
+        try:
+            # Stream positions straight from the memory-mapped PLY; OBJ only
+            # needs the points, so there is no mesh to build
+            vertices = open_vertices(ply_path)
+        except ValueError as e:
+            # Not a layout the memmap reader handles (e.g. ASCII); load it whole
+            logger.info(f"Falling back to plyfile for OBJ export: {e}")
+            vertices = PlyData.read(str(ply_path))['vertex'].data
         
-        # If it's a point cloud, create a simple mesh representation
-        if isinstance(mesh, trimesh.PointCloud):
-            # For point clouds, we'll create a simple representation
-            # In production, you might want to use Poisson reconstruction
-            logger.warning("Converting point cloud to OBJ - using simple representation")
-            # Create a basic mesh from point cloud (convex hull as fallback)
-            mesh = mesh.convex_hull
+        with open(obj_path, 'w') as f:
+            for start in range(0, len(vertices), OBJ_CHUNK_VERTICES):
+                chunk = vertices[start:start + OBJ_CHUNK_VERTICES]
+                xyz = as_xyz_view(chunk)
+                if xyz is None:
+                    xyz = np.column_stack((chunk['x'], chunk['y'], chunk['z']))
+                # One C-level format call per chunk instead of one per vertex
+                f.write(_OBJ_VERTEX_LINE * len(xyz) % tuple(xyz.ravel().tolist()))
         
-        # Export to OBJ
-        mesh.export(str(obj_path), file_type='obj')
-        logger.info(f"Exported OBJ to {obj_path}")
+        logger.info(f"Exported OBJ to {obj_path} ({len(vertices)} vertices)")
         return obj_path
         
     except Exception as e:
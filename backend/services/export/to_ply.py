@@ -1,15 +1,69 @@
 """
 Export model to PLY format
 """
+import asyncio
 import logging
+import os
+import re
 import shutil
 from pathlib import Path
+from typing import Optional
 
 logger = logging.getLogger(__name__)
 
+_ITERATION_DIR = re.compile(r"iteration_(\d+)")
+
+def _link_or_copy(src: Path, dst: Path):
+    """
+    Hardlink src to dst, copying only when linking isn't possible
+    
+    The trained PLY is never modified after export, so both names can share
+    the same data. copyfile is the fallback (e.g. across filesystems); it
+    uses sendfile on Linux and skips copy2's metadata calls.
+    """
+    dst.unlink(missing_ok=True)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+def find_model_ply(model_dir: Path) -> Path:
+    """
+    Locate the trained PLY inside a LongSplat output directory
+    
+    Scans the tree once and prefers, in order: PLYs in the root directory,
+    point_cloud.ply files (Gaussian Splatting writes one per
+    point_cloud/iteration_XXXX/, the highest iteration wins), then any PLY.
+    
+    Raises:
+        FileNotFoundError: If the directory holds no PLY file
+    """
+    ply_files = list(model_dir.rglob("*.ply"))
+    
+    if not ply_files:
+        logger.error(f"No PLY file found in {model_dir}")
+        logger.error(f"Directory contents: {list(model_dir.rglob('*'))}")
+        raise FileNotFoundError(f"No PLY file found in {model_dir}")
+    
+    def rank(path: Path):
+        match = _ITERATION_DIR.fullmatch(path.parent.name)
+        return (
+            path.parent == model_dir,
+            path.name == "point_cloud.ply",
+            int(match.group(1)) if match else -1,
+            str(path)
+        )
+    
+    source_ply = max(ply_files, key=rank)
+    logger.info(f"Found PLY file: {source_ply}")
+    return source_ply
+
+
 async def export_to_ply(
     model_dir: Path,
-    job_id: str
+    job_id: str,
+    source_ply: Optional[Path] = None
 ) -> Path:
     """
     Export model to PLY format
@@ -17,31 +71,16 @@ async def export_to_ply(
     Args:
         model_dir: Directory containing the trained model
         job_id: Job identifier for output filename
+        source_ply: Trained PLY, if already located with find_model_ply
     
     Returns:
         Path to exported PLY file
     """
     output_ply = model_dir.parent / f"{job_id}.ply"
     
-    # First check root directory
-    ply_files = list(model_dir.glob("*.ply"))
+    if source_ply is None:
+        source_ply = find_model_ply(model_dir)
     
-    # If not found, search recursively (Gaussian Splatting outputs to point_cloud/iteration_XXXX/)
-    if not ply_files:
-        ply_files = list(model_dir.rglob("point_cloud.ply"))
-    
-    # Still nothing? Try any PLY file recursively
-    if not ply_files:
-        ply_files = list(model_dir.rglob("*.ply"))
-    
-    if ply_files:
-        # Use the most recent / last iteration's PLY file
-        source_ply = sorted(ply_files)[-1]
-        logger.info(f"Found PLY file: {source_ply}")
-        shutil.copy2(source_ply, output_ply)
-        logger.info(f"Exported PLY to {output_ply}")
-        return output_ply
-    else:
-        logger.error(f"No PLY file found in {model_dir}")
-        logger.error(f"Directory contents: {list(model_dir.rglob('*'))}")
-        raise FileNotFoundError(f"No PLY file found in {model_dir}")
+    await asyncio.to_thread(_link_or_copy, source_ply, output_ply)
+    logger.info(f"Exported PLY to {output_ply}")
+    return output_ply
@@ -1,10 +1,18 @@
 import numpy as np
+from numpy.lib.recfunctions import structured_to_unstructured
 from plyfile import PlyData, PlyElement
 from pathlib import Path
 import logging
+from utils.files import fast_copy
+from utils.ply import as_xyz_view, open_vertices
 
 logger = logging.getLogger(__name__)
 
+# Vertices per slice when centering a memory-mapped PLY
+CENTER_CHUNK_VERTICES = 1 << 20
+# Largest centroid offset (per axis) treated as already centered
+CENTERED_TOLERANCE = 1e-6
+
 class PlyOptimizer:
     """
     Standard post-processing pipeline for 3D Gaussian Splatting models.
@@ -23,32 +31,93 @@ class PlyOptimizer:
         try:
             logger.info(f"Optimizing PLY model: {ply_path}")
             
-            # Read PLY
-            plydata = PlyData.read(str(ply_path))
-            vertex = plydata['vertex']
+            try:
+                vertices = open_vertices(ply_path)
+            except ValueError as e:
+                # Not a layout the memmap reader handles (e.g. ASCII); load it whole
+                logger.info(f"Falling back to in-memory centering: {e}")
+                return PlyOptimizer._center_in_memory(ply_path, output_path)
             
-            # Extract positions
-            x = vertex['x']
-            y = vertex['y']
-            z = vertex['z']
+            # Two passes over the mapped vertices, one slice at a time, so
+            # memory stays flat however many points the model has
+            total = np.zeros(3, dtype=np.float64)
+            for start in range(0, len(vertices), CENTER_CHUNK_VERTICES):
+                chunk = vertices[start:start + CENTER_CHUNK_VERTICES]
+                total += PlyOptimizer._positions(chunk).sum(axis=0, dtype=np.float64)
+            centroid = total / max(len(vertices), 1)
+            del vertices
             
-            # Compute Centroid
-            centroid_x = np.mean(x)
-            centroid_y = np.mean(y)
-            centroid_z = np.mean(z)
+            logger.info(f"Found centroid at ({centroid[0]:.4f}, {centroid[1]:.4f}, {centroid[2]:.4f})")
             
-            logger.info(f"Found centroid at ({centroid_x:.4f}, {centroid_y:.4f}, {centroid_z:.4f})")
+            # The output is edited in place, so start from a copy of the source
+            if Path(output_path) != Path(ply_path):
+                fast_copy(ply_path, output_path)
+            if PlyOptimizer._is_centered(centroid):
+                logger.info("Model is already centered, leaving positions unchanged")
+                return True
             
-            # Center positions
-            vertex['x'] = x - centroid_x
-            vertex['y'] = y - centroid_y
-            vertex['z'] = z - centroid_z
+            # Center positions in place
+            vertices = open_vertices(output_path, mode="r+")
+            for start in range(0, len(vertices), CENTER_CHUNK_VERTICES):
+                PlyOptimizer._subtract_centroid(vertices[start:start + CENTER_CHUNK_VERTICES], centroid)
+            vertices.flush()
+            del vertices
             
-            # Save optimized PLY
-            PlyData([vertex], text=False).write(str(output_path))
             logger.info(f"Saved centered model to {output_path}")
             return True
             
         except Exception as e:
             logger.error(f"Failed to optimize PLY: {e}")
             return False
+    
+    @staticmethod
+    def _positions(vertices: np.ndarray) -> np.ndarray:
+        """Return the x/y/z fields of structured vertices as one (N, 3) array"""
+        xyz = as_xyz_view(vertices)
+        if xyz is None:
+            xyz = structured_to_unstructured(vertices[['x', 'y', 'z']])
+        return xyz
+    
+    @staticmethod
+    def _subtract_centroid(vertices: np.ndarray, centroid: np.ndarray):
+        """Subtract the centroid from the positions of structured vertices in place"""
+        xyz = as_xyz_view(vertices)
+        if xyz is not None:
+            # One broadcast subtraction over the (N, 3) view. Casting the
+            # centroid to the field dtype first keeps the ufunc on its
+            # float32 SIMD loop instead of upcasting every element to float64.
+            np.subtract(xyz, centroid.astype(xyz.dtype), out=xyz)
+        else:
+            for i, axis in enumerate(('x', 'y', 'z')):
+                field = vertices[axis]
+                np.subtract(field, field.dtype.type(centroid[i]), out=field)
+    
+    @staticmethod
+    def _is_centered(centroid: np.ndarray) -> bool:
+        """Whether a centroid is close enough to the origin to skip rewriting"""
+        return bool(np.max(np.abs(centroid)) < CENTERED_TOLERANCE)
+    
+    @staticmethod
+    def _center_in_memory(ply_path: Path, output_path: Path):
+        """Center a PLY through plyfile, loading it fully into memory"""
+        plydata = PlyData.read(str(ply_path))
+        vertex = plydata['vertex']
+        
+        # Work on plyfile's structured array directly, so the centered
+        # positions land in the buffer that gets written
+        centroid = PlyOptimizer._positions(vertex.data).mean(axis=0, dtype=np.float64)
+        
+        logger.info(f"Found centroid at ({centroid[0]:.4f}, {centroid[1]:.4f}, {centroid[2]:.4f})")
+        
+        if PlyOptimizer._is_centered(centroid) and Path(output_path) == Path(ply_path):
+            logger.info("Model is already centered, skipping rewrite")
+            return True
+        
+        # Center positions
+        PlyOptimizer._subtract_centroid(vertex.data, centroid)
+        
+        # Save optimized PLY as binary little-endian, the layout the web
+        # viewer parses, regardless of the host's native byte order
+        PlyData([vertex], text=False, byte_order='<').write(str(output_path))
+        logger.info(f"Saved centered model to {output_path}")
+        return True
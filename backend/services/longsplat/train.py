@@ -3,19 +3,42 @@ Train LongSplat model for unposed 3D reconstruction from video frames
 https://github.com/NVlabs/LongSplat
 """
 import asyncio
-import hashlib
+import contextlib
+import importlib.metadata
+import importlib.util
 import logging
 import os
+import re
 import shutil
 import subprocess
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
+from itertools import islice
 from pathlib import Path
+from typing import BinaryIO, Optional, Set
+from core.config import get_settings
+from utils.files import fast_copy
 from utils.shell import run_command
 
 logger = logging.getLogger(__name__)
+settings = get_settings()
 
 # Path to LongSplat repository
 LONGSPLAT_REPO_URL = "https://github.com/NVlabs/LongSplat.git"
 
+# Frames written by extract_frames (and legacy PNG extractions)
+FRAME_EXTENSIONS = (".png", ".jpg")
+
+_ITERATION_DIR = re.compile(r"iteration_(\d+)")
+# Bytes of training output kept in memory for reporting a failure
+LOG_TAIL_BYTES = 256 * 1024
+# Read size for training output, and the training.log write buffer size
+OUTPUT_CHUNK_SIZE = 64 * 1024
+LOG_WRITE_BUFFER_SIZE = 1024 * 1024
+
 def _resolve_longsplat_repo() -> Path:
     """Resolve LongSplat repository path."""
     # Check environment variable first (set in Docker)
@@ -30,18 +53,87 @@ def _resolve_longsplat_repo() -> Path:
 
 LONGSPLAT_REPO = _resolve_longsplat_repo()
 
+@lru_cache(maxsize=1)
+def _training_env() -> dict:
+    """
+    Environment for LongSplat subprocesses, built once per process
+    
+    Adds LONGSPLAT_REPO to PYTHONPATH; the CUDA submodules are installed
+    with pip, so nothing else needs to be on the path.
+    """
+    env = os.environ.copy()
+    pythonpath = env.get('PYTHONPATH', '')
+    if str(LONGSPLAT_REPO) not in pythonpath:
+        env['PYTHONPATH'] = f"{LONGSPLAT_REPO}:{pythonpath}" if pythonpath else str(LONGSPLAT_REPO)
+    # Load CUDA kernels on first use instead of all at startup
+    env.setdefault('CUDA_MODULE_LOADING', 'LAZY')
+    # Grow the CUDA caching allocator's segments instead of splitting fixed
+    # blocks, which fragments over long runs
+    if settings.LONGSPLAT_CUDA_ALLOC_CONF:
+        env.setdefault('PYTORCH_CUDA_ALLOC_CONF', settings.LONGSPLAT_CUDA_ALLOC_CONF)
+    # Keep JIT-built torch extensions and the driver's PTX cache on the
+    # storage volume so each run (and container restart) reuses them
+    env.setdefault('TORCH_EXTENSIONS_DIR', str(settings.CACHE_DIR / "torch_extensions"))
+    env.setdefault('CUDA_CACHE_PATH', str(settings.CACHE_DIR / "cuda"))
+    # The repo is read-only at runtime; don't try to write .pyc files on every start
+    env.setdefault('PYTHONDONTWRITEBYTECODE', '1')
+    return env
+
+# Background scene directory removals still in progress
+_pending_cleanups: Set[asyncio.Task] = set()
+
+@dataclass
+class _WarmState:
+    """
+    One-time setup results shared by every training job in this process
+    
+    Only successes are recorded, so a failed check is retried by the next job.
+    """
+    repo_ready: bool = False  # LongSplat repository found or cloned
+    gpu_check: Optional[tuple[bool, str]] = None  # Passing GPU check result
+    diagnostics_passed: bool = False  # CUDA extensions located
+
+_warm_state = _WarmState()
+
+
 def _verify_gpu_compatibility() -> tuple[bool, str]:
     """
     Verify that the current GPU is compatible with the built CUDA extensions.
     This image is built for A40 (sm_86).
+    
+    A passing result is cached: the GPU can't change under a running
+    process, so nvidia-smi only needs to run once.
+    """
+    if _warm_state.gpu_check is not None:
+        return _warm_state.gpu_check
+    
+    ok, message = _query_gpu_compatibility()
+    if ok:
+        _warm_state.gpu_check = (ok, message)
+    return ok, message
+
+
+def _query_gpu_compatibility() -> tuple[bool, str]:
+    """
+    Query the GPU for _verify_gpu_compatibility
+    
+    Asks nvidia-smi rather than torch, so the service process never loads
+    PyTorch or creates a CUDA context; only the training process needs them.
     """
     try:
-        import torch
-        if not torch.cuda.is_available():
-            return False, "CUDA not available"
-        
-        device_name = torch.cuda.get_device_name(0)
-        capability = torch.cuda.get_device_capability(0)
+        nvidia_smi = shutil.which("nvidia-smi")
+        if nvidia_smi is None:
+            return False, "CUDA not available (nvidia-smi not found)"
+        result = subprocess.run(
+            [nvidia_smi, "--query-gpu=name,compute_cap", "--format=csv,noheader"],
+            capture_output=True, text=True, timeout=10, check=True
+        )
+        first_gpu = result.stdout.strip().splitlines()
+        if not first_gpu:
+            return False, "CUDA not available (no GPU reported)"
+        
+        device_name, compute_cap = (field.strip() for field in first_gpu[0].rsplit(",", 1))
+        capability = tuple(int(part) for part in compute_cap.split("."))
         
         # This image is built for sm_86 (A40, RTX 3090)
         expected_major, expected_minor = 8, 6
@@ -58,6 +150,179 @@ def _verify_gpu_compatibility() -> tuple[bool, str]:
         return False, f"GPU check failed: {e}"
 
 
+def _latest_iteration_ply(output_dir: Path) -> Optional[Path]:
+    """
+    Return point_cloud/iteration_N/point_cloud.ply for the highest N
+    
+    Iterations are compared numerically, so iteration_10000 beats
+    iteration_7000 (a plain sort would order them as strings). The path is
+    returned whether or not the PLY exists; the caller checks.
+    """
+    latest = None
+    latest_iteration = -1
+    try:
+        with os.scandir(output_dir / "point_cloud") as entries:
+            for entry in entries:
+                match = _ITERATION_DIR.fullmatch(entry.name)
+                if match and int(match.group(1)) > latest_iteration and entry.is_dir():
+                    latest, latest_iteration = entry.path, int(match.group(1))
+    except FileNotFoundError:
+        return None
+    return Path(latest) / "point_cloud.ply" if latest else None
+
+
+async def _drain_output(stream: asyncio.StreamReader, log_file: Optional[BinaryIO]) -> str:
+    """
+    Consume a training process's output until it exits
+    
+    Keeps only the last LOG_TAIL_BYTES in memory for error reporting and
+    copies everything to log_file when one is given.
+    
+    Returns:
+        The last 200 lines of output
+    """
+    tail = bytearray()
+    truncated = False
+    while True:
+        chunk = await stream.read(OUTPUT_CHUNK_SIZE)
+        if not chunk:
+            break
+        if log_file is not None:
+            log_file.write(chunk)
+        tail += chunk
+        if len(tail) > LOG_TAIL_BYTES:
+            del tail[:len(tail) - LOG_TAIL_BYTES]
+            truncated = True
+    
+    lines = tail.decode("utf-8", errors="replace").splitlines()
+    if truncated:
+        lines = lines[1:]  # First line is probably cut off
+    return "\n".join(lines[-200:])
+
+
+def _stage_frame(frame_path: str, target: str):
+    """
+    Link a frame into the scene directory without copying its data
+    
+    Frames are read-only during training, so a hardlink is safe and, unlike
+    a symlink, keeps working if the frames directory is cleaned up first.
+    Falls back to a symlink across filesystems, then to a copy. With
+    LONGSPLAT_STAGE_MODE=copy frames are always copied.
+    """
+    if settings.LONGSPLAT_STAGE_MODE == "copy":
+        shutil.copy2(frame_path, target)
+        return
+    try:
+        os.link(frame_path, target)
+        return
+    except OSError:
+        pass
+    try:
+        os.symlink(frame_path, target)
+    except OSError:
+        shutil.copy2(frame_path, target)
+
+
+def _stage_frames(frames_dir: Path, images_dir: Path) -> int:
+    """
+    Stage every extracted frame into the scene images directory
+    
+    Lists frames with a single scandir pass (no per-path glob matching or
+    stat) and spreads the per-frame syscalls over FRAME_STAGING_WORKERS
+    threads. Paths stay plain strings from DirEntry.path, so no Path
+    objects are built per frame.
+    
+    Returns:
+        Number of frames staged
+    """
+    with os.scandir(frames_dir.resolve()) as entries:
+        frames = sorted(
+            (entry.path, os.path.join(images_dir, entry.name))
+            for entry in entries
+            if entry.name.endswith(FRAME_EXTENSIONS) and entry.is_file()
+        )
+    
+    # Links are cheap metadata calls; more threads than this only adds contention
+    workers = max(1, min(settings.FRAME_STAGING_WORKERS, (os.cpu_count() or 1) * 2, len(frames)))
+    if workers == 1:
+        for frame_path, target in frames:
+            _stage_frame(frame_path, target)
+        return len(frames)
+    
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # list() drains the iterator so any staging error is raised here
+        list(pool.map(_stage_frame, *zip(*frames)))
+    return len(frames)
+
+
+def _run_dependency_diagnostics():
+    """
+    Check that PyTorch and the CUDA extensions LongSplat needs are installed
+    
+    Runs once per process; after the first success later jobs skip it.
+    
+    Raises:
+        RuntimeError: If a critical dependency is missing
+    """
+    if _warm_state.diagnostics_passed:
+        return
+    try:
+        logger.info("Running dependency diagnostics...")
+        # Locate the modules without importing them, which would load torch
+        # and CUDA into the service process
+        logger.info(f"PyTorch: {importlib.metadata.version('torch')}")
+        for module in ("diff_gaussian_rasterization", "simple_knn", "fused_ssim"):
+            spec = importlib.util.find_spec(module)
+            if spec is None:
+                raise ImportError(f"No module named '{module}'")
+            logger.info(f"{module}: {spec.origin}")
+        logger.info("Diagnostics passed: All CUDA extensions importable.")
+        _warm_state.diagnostics_passed = True
+    except (ImportError, importlib.metadata.PackageNotFoundError) as e:
+        logger.error(f"Dependency diagnostic failed: {e}")
+        logger.error("This suggests the Docker image needs to be fully rebuilt.")
+        raise RuntimeError(f"Critical dependency missing: {e}")
+    except Exception as e:
+        logger.error(f"Unexpected diagnostic error: {e}")
+
+
+async def _remove_scene_dir(scene_dir: Path):
+    """
+    Delete a job's scene directory without blocking the event loop
+    
+    Removing thousands of staged frames is one unlink each; it runs in a
+    worker thread, and failures are logged rather than raised.
+    """
+    def on_error(function, path, exc_info):
+        logger.warning(f"Failed to clean up {path}: {exc_info[1]}")
+    
+    if not scene_dir.exists():
+        return
+    await asyncio.to_thread(shutil.rmtree, scene_dir, onerror=on_error)
+    logger.info(f"Cleaned up scene directory: {scene_dir}")
+
+
+def _schedule_scene_cleanup(scene_dir: Path):
+    """
+    Remove a job's scene directory in the background
+    
+    The directory is first renamed out of the way (a single metadata
+    operation), so the job can finish at once and a new run for the same
+    job never races with the deletion.
+    """
+    if not scene_dir.exists():
+        return
+    doomed = scene_dir.with_name(f".{scene_dir.name}.deleting-{time.time_ns()}")
+    try:
+        scene_dir.rename(doomed)
+    except OSError:
+        doomed = scene_dir
+    task = asyncio.create_task(_remove_scene_dir(doomed), name=f"cleanup-{scene_dir.name}")
+    # The event loop only keeps weak references to tasks
+    _pending_cleanups.add(task)
+    task.add_done_callback(_pending_cleanups.discard)
+
+
 async def train_longsplat(
     frames_dir: Path,
     output_dir: Path,
@@ -80,7 +345,7 @@ async def train_longsplat(
         logger.info(f"Starting LongSplat training from {frames_dir}")
         
         # Verify GPU compatibility before starting expensive training
-        gpu_ok, gpu_msg = _verify_gpu_compatibility()
+        gpu_ok, gpu_msg = await asyncio.to_thread(_verify_gpu_compatibility)
         logger.info(f"GPU check: {gpu_msg}")
         if not gpu_ok:
             logger.error(gpu_msg)
@@ -92,23 +357,7 @@ async def train_longsplat(
             return False
             
         # DIAGNOSTICS: Check key dependencies explicitly
-        try:
-            logger.info("Running dependency diagnostics...")
-            import torch
-            logger.info(f"PyTorch: {torch.__version__} (CUDA: {torch.version.cuda})")
-            import diff_gaussian_rasterization
-            logger.info(f"diff_gaussian_rasterization: {diff_gaussian_rasterization.__file__}")
-            import simple_knn
-            logger.info(f"simple_knn: {simple_knn.__file__}")
-            import fused_ssim
-            logger.info(f"fused_ssim: {fused_ssim.__file__}")
-            logger.info("Diagnostics passed: All CUDA extensions importable.")
-        except ImportError as e:
-            logger.error(f"Dependency diagnostic failed: {e}")
-            logger.error("This suggests the Docker image needs to be fully rebuilt.")
-            raise RuntimeError(f"Critical dependency missing: {e}")
-        except Exception as e:
-            logger.error(f"Unexpected diagnostic error: {e}")
+        _run_dependency_diagnostics()
         
         # Prepare the scene directory structure - USE UNIQUE DIRECTORY PER JOB
         try:
@@ -120,18 +369,15 @@ async def train_longsplat(
             # Clean up any existing scene directory for this job (ensure fresh start)
             if scene_dir.exists():
                 logger.info(f"Cleaning up existing scene directory: {scene_dir}")
-                shutil.rmtree(scene_dir)
+                await _remove_scene_dir(scene_dir)
             
             images_dir.mkdir(parents=True, exist_ok=True)
             
-            # Copy frames to images directory
-            logger.info(f"Copying frames to {images_dir}")
-            frame_count = 0
-            for frame_path in sorted(frames_dir.glob("*.png")) + sorted(frames_dir.glob("*.jpg")):
-                shutil.copy2(frame_path, images_dir / frame_path.name)
-                frame_count += 1
+            # Link frames into images directory (frames are only read by LongSplat)
+            logger.info(f"Linking frames into {images_dir}")
+            frame_count = await asyncio.to_thread(_stage_frames, frames_dir, images_dir)
             
-            logger.info(f"Copied {frame_count} frames to scene directory")
+            logger.info(f"Scene directory ready: {scene_dir} ({frame_count} images)")
         except Exception as e:
             logger.error(f"Failed to prepare scene directory: {e}", exc_info=True)
             return False
@@ -145,7 +391,7 @@ async def train_longsplat(
         
         # Generate unique port based on output directory hash to avoid conflicts
         # Use port range 6010-65000 (6009 is default)
-        port_hash = int(hashlib.md5(str(output_dir).encode()).hexdigest()[:8], 16)
+        port_hash = zlib.crc32(str(output_dir).encode())
         unique_port = 6010 + (port_hash % 59000)  # Range: 6010-65009
         
         # Calculate optimal init_frame_num based on total frames (use ~20% of frames, min 10)
@@ -177,55 +423,55 @@ async def train_longsplat(
         logger.info(f"Running LongSplat training: {' '.join(cmd)}")
         logger.info(f"Using unique port {unique_port} for network GUI (avoids conflicts)")
         logger.info(f"Working directory: {LONGSPLAT_REPO}")
-        logger.info(f"Scene directory contents: {list(scene_dir.iterdir())}")
-        logger.info(f"Images directory contents: {list(images_dir.iterdir())[:5]}...")  # First 5 files
-        logger.info(f"PYTHONPATH: {os.environ.get('PYTHONPATH', 'NOT SET')}")
-        logger.info(f"Current PATH: {os.environ.get('PATH', 'NOT SET')[:200]}...")
-        
-        # Prepare environment with PYTHONPATH for LongSplat submodules
-        env = os.environ.copy()
-        pythonpath = env.get('PYTHONPATH', '')
-        if str(LONGSPLAT_REPO) not in pythonpath:
-            # We only need LongSplat here - submodules are managed by sys.path or pip install
-            env['PYTHONPATH'] = f"{LONGSPLAT_REPO}:{pythonpath}" if pythonpath else str(LONGSPLAT_REPO)
-        
+        if logger.isEnabledFor(logging.DEBUG):
+            with os.scandir(scene_dir) as entries:
+                logger.debug(f"Scene directory contents: {[entry.name for entry in entries]}")
+            with os.scandir(images_dir) as entries:
+                first_images = [entry.name for entry in islice(entries, 5)]
+            logger.debug(f"Images directory contents: {first_images}...")  # First 5 files
+            logger.debug(f"Current PATH: {os.environ.get('PATH', 'NOT SET')[:200]}...")
+        
+        env = _training_env()
         logger.info(f"Using PYTHONPATH: {env['PYTHONPATH']}")
         
-        # Run training with direct file logging to avoid buffer truncation
-        # This is critical because long training runs produce too much output for memory buffers
+        # Output is drained as it arrives into a bounded in-memory tail for
+        # error reports; the full log is only written to disk when asked for,
+        # so it doesn't compete with checkpoint writes on long runs
         log_file_path = output_dir / "training.log"
-        logger.info(f"Streaming training output to {log_file_path}")
+        if settings.LONGSPLAT_VERBOSE:
+            logger.info(f"Streaming training output to {log_file_path}")
         
         timeout_seconds = 3600 * 4  # 4 hours max
         
         try:
-            with open(log_file_path, "w") as log_file:
+            with contextlib.ExitStack() as stack:
+                log_file = None
+                if settings.LONGSPLAT_VERBOSE:
+                    log_file = stack.enter_context(
+                        open(log_file_path, "wb", buffering=LOG_WRITE_BUFFER_SIZE)
+                    )
                 process = await asyncio.create_subprocess_exec(
                     *cmd,
                     cwd=str(LONGSPLAT_REPO),
                     env=env,
-                    stdout=log_file,
+                    stdout=asyncio.subprocess.PIPE,
                     stderr=asyncio.subprocess.STDOUT  # Merge stderr into stdout
                 )
+                drain = asyncio.create_task(_drain_output(process.stdout, log_file))
                 
                 try:
                     await asyncio.wait_for(process.wait(), timeout=timeout_seconds)
                 except asyncio.TimeoutError:
                     process.kill()
+                    drain.cancel()
                     logger.error(f"LongSplat training timed out after {timeout_seconds} seconds")
                     raise
+                tail = await drain
                 
                 if process.returncode != 0:
-                    # Read the tail of the log file to show the error
+                    # Show the tail of the output to explain the error
                     logger.error(f"Training failed with return code {process.returncode}")
-                    try:
-                        with open(log_file_path, "r") as f:
-                            # Read last 200 lines efficiently-ish
-                            lines = f.readlines()
-                            tail = "".join(lines[-200:])
-                            logger.error(f"Training Log Tail:\n{tail}")
-                    except Exception as read_err:
-                        logger.error(f"Could not read log tail: {read_err}")
+                    logger.error(f"Training Log Tail:\n{tail}")
                     
                     raise subprocess.CalledProcessError(process.returncode, cmd)
             
@@ -239,11 +485,7 @@ async def train_longsplat(
         point_cloud = output_dir / "point_cloud" / f"iteration_{iterations}" / "point_cloud.ply"
         if not point_cloud.exists():
             # Also try looking for the latest iteration
-            point_cloud_dir = output_dir / "point_cloud"
-            if point_cloud_dir.exists():
-                iteration_dirs = sorted([d for d in point_cloud_dir.glob("iteration_*") if d.is_dir()])
-                if iteration_dirs:
-                    point_cloud = iteration_dirs[-1] / "point_cloud.ply"
+            point_cloud = _latest_iteration_ply(output_dir) or point_cloud
             
             if not point_cloud.exists():
                 logger.error(f"Point cloud not generated at {point_cloud}")
@@ -251,39 +493,24 @@ async def train_longsplat(
         
         # Copy the final PLY to the root output directory
         final_ply = output_dir / "model.ply"
-        shutil.copy2(point_cloud, final_ply)
+        await asyncio.to_thread(fast_copy, point_cloud, final_ply)
         
         logger.info(f"LongSplat training completed successfully. Model saved to {final_ply}")
         
         # Clean up scene directory to free disk space
-        try:
-            if scene_dir.exists():
-                shutil.rmtree(scene_dir)
-                logger.info(f"Cleaned up scene directory: {scene_dir}")
-        except Exception as cleanup_error:
-            logger.warning(f"Failed to clean up scene directory: {cleanup_error}")
+        _schedule_scene_cleanup(scene_dir)
         
         return True
         
     except asyncio.TimeoutError:
         logger.error(f"LongSplat training timed out after {timeout_seconds} seconds")
         # Still try to clean up on timeout
-        try:
-            scene_dir = frames_dir.parent / f"longsplat_scene_{output_dir.name}"
-            if scene_dir.exists():
-                shutil.rmtree(scene_dir)
-        except:
-            pass
+        _schedule_scene_cleanup(frames_dir.parent / f"longsplat_scene_{output_dir.name}")
         return False
     except Exception as e:
         logger.error(f"LongSplat training failed: {e}", exc_info=True)
         # Still try to clean up on error
-        try:
-            scene_dir = frames_dir.parent / f"longsplat_scene_{output_dir.name}"
-            if scene_dir.exists():
-                shutil.rmtree(scene_dir)
-        except:
-            pass
+        _schedule_scene_cleanup(frames_dir.parent / f"longsplat_scene_{output_dir.name}")
         return False
 
 
@@ -291,9 +518,13 @@ async def _setup_longsplat_repo() -> bool:
     """
     Setup LongSplat repository (should already be installed in Docker)
     """
+    if _warm_state.repo_ready:
+        return True
+    
     try:
         if LONGSPLAT_REPO.exists() and (LONGSPLAT_REPO / "train.py").exists():
             logger.info(f"LongSplat repository found at {LONGSPLAT_REPO}")
+            _warm_state.repo_ready = True
             return True
         
         logger.info("LongSplat repository not found. Cloning...")
@@ -315,6 +546,7 @@ async def _setup_longsplat_repo() -> bool:
                 await run_command(cmd_clone)
         
                 logger.info("Repository cloned successfully")
+                _warm_state.repo_ready = True
                 return True
             except Exception as e:
                 logger.error(f"Failed to clone repository: {e}")
@@ -369,12 +601,12 @@ async def convert_to_3dgs_format(
             # Internal Post-Processing Pipeline
             # 1. Center the model (Critical for viewer)
             # 2. Save final artifact
-            if PlyOptimizer.center_model(raw_ply, output_ply):
+            if await asyncio.to_thread(PlyOptimizer.center_model, raw_ply, output_ply):
                 logger.info(f"Final optimized model saved to {output_ply}")
                 return True
             else:
                 logger.error("Post-processing failed, copying raw file instead.")
-                shutil.copy2(raw_ply, output_ply)
+                await asyncio.to_thread(fast_copy, raw_ply, output_ply)
                 return True
         
         return False
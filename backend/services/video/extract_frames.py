@@ -4,14 +4,19 @@ Extract frames from video using FFmpeg
 import asyncio
 import logging
 from pathlib import Path
+from typing import Optional
+from core.config import get_settings
 from utils.shell import run_command
 
 logger = logging.getLogger(__name__)
+settings = get_settings()
 
 async def extract_frames(
     video_path: Path,
     output_dir: Path,
-    fps: float = 2.0
+    fps: float = 2.0,
+    mode: Optional[str] = None,
+    resolution: int = 1
 ) -> Path:
     """
     Extract frames from video at specified FPS
@@ -19,7 +24,9 @@ async def extract_frames(
     Args:
         video_path: Path to input video file
         output_dir: Directory to save extracted frames
-        fps: Frames per second to extract
+        fps: Frames per second to extract (ignored in keyframe mode)
+        mode: "fps" or "keyframe"; defaults to FRAME_EXTRACTION_MODE
+        resolution: Downscale factor applied while extracting (1 keeps full size)
     
     Returns:
         Path to directory containing extracted frames
@@ -27,17 +34,43 @@ async def extract_frames(
     output_dir.mkdir(parents=True, exist_ok=True)
     frame_pattern = output_dir / "frame_%06d.jpg"
     
-    logger.info(f"Extracting frames from {video_path} at {fps} FPS")
+    mode = mode or settings.FRAME_EXTRACTION_MODE
+    # Decode on the GPU when configured; frames are downloaded to system
+    # memory for the filters and the JPEG encoder, which run on the CPU
+    hwaccel = ["-hwaccel", settings.FFMPEG_HWACCEL] if settings.FFMPEG_HWACCEL else []
     
-    # FFmpeg command to extract frames
-    cmd = [
-        "ffmpeg",
-        "-y",  # Overwrite without asking
-        "-i", str(video_path),
-        "-vf", f"fps={fps}",
-        "-q:v", "2",  # High quality JPEG
-        str(frame_pattern)
-    ]
+    # Scale once here so training doesn't decode full-size JPEGs only to
+    # shrink them on every pass over the data
+    scale = f"scale=iw/{resolution}:ih/{resolution}:flags=lanczos" if resolution > 1 else None
+    
+    if mode == "keyframe":
+        logger.info(f"Extracting keyframes from {video_path}")
+        # Skip decoding non-key frames entirely rather than decoding every
+        # frame and dropping most of them in the fps filter
+        cmd = [
+            settings.FFMPEG_PATH,
+            "-y",  # Overwrite without asking
+            *hwaccel,
+            "-skip_frame", "nokey",
+            "-i", str(video_path),
+            *(["-vf", scale] if scale else []),
+            "-vsync", "vfr",  # One image per decoded keyframe, no duplicates
+            "-q:v", "2",  # High quality JPEG
+            str(frame_pattern)
+        ]
+    else:
+        logger.info(f"Extracting frames from {video_path} at {fps} FPS")
+        
+        # FFmpeg command to extract frames
+        cmd = [
+            settings.FFMPEG_PATH,
+            "-y",  # Overwrite without asking
+            *hwaccel,
+            "-i", str(video_path),
+            "-vf", f"fps={fps},{scale}" if scale else f"fps={fps}",
+            "-q:v", "2",  # High quality JPEG
+            str(frame_pattern)
+        ]
     
     try:
         await run_command(cmd)
@@ -1,21 +1,44 @@
 """
 Video validation service - validates videos before processing
 """
+import asyncio
 import logging
+import os
 import subprocess
-import json
+import struct
+import time
 from pathlib import Path
-from typing import Tuple, Optional
+from typing import List, Literal, Tuple, Optional, Union
 from dataclasses import dataclass
+from collections import OrderedDict
+import orjson
 from core.config import get_settings
+from utils.mp4 import read_video_track
+from utils.shell import kill_process
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
+# Seconds ffprobe gets per file
+PROBE_TIMEOUT = 30
+# Probed files whose metadata is kept in memory
+PROBE_CACHE_SIZE = 256
+# Seconds a timed-out probe is remembered before the file is tried again
+PROBE_TIMEOUT_TTL = 30
+# (path, mtime_ns, size) -> (outcome, monotonic expiry or None), least recently used first
+_probe_cache: "OrderedDict[Tuple[str, int, int], Tuple[ProbeOutcome, Optional[float]]]" = OrderedDict()
 
-@dataclass
+# ffprobe is effectively single-threaded, so more concurrent probes than
+# cores only adds contention; bursts of uploads queue here instead
+_PROBE_SEM = asyncio.Semaphore(max(2, os.cpu_count() or 4))
+
+# Containers whose moov header is read directly before falling back to ffprobe
+MP4_EXTENSIONS = {".mp4", ".mov", ".m4v"}
+
+
+@dataclass(slots=True, frozen=True)
 class VideoInfo:
-    """Video metadata"""
+    """Video metadata; immutable, since probe results are shared via the cache"""
     duration: float  # seconds
     width: int
     height: int
@@ -24,7 +47,18 @@ class VideoInfo:
     file_size: int  # bytes
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
+class ProbeError:
+    """Why a video couldn't be probed"""
+    kind: Literal["timeout", "no_stream", "nonzero", "parse", "os"]
+    detail: str
+
+
+# What get_video_info returns: metadata, or the reason there is none
+ProbeOutcome = Union[VideoInfo, ProbeError]
+
+
+@dataclass(slots=True, frozen=True)
 class ValidationResult:
     """Result of video validation"""
     valid: bool
@@ -33,65 +67,219 @@ class ValidationResult:
     warnings: list[str]
 
 
-def get_video_info(video_path: Path) -> Optional[VideoInfo]:
+def get_video_info(video_path: Path, st: Optional[os.stat_result] = None) -> ProbeOutcome:
     """
     Extract video metadata using ffprobe
+    
+    Results are cached per path, modification time and size, so validating
+    an unchanged file again doesn't spawn another ffprobe. Pass st when the
+    caller has already stat'ed the file. Failures come back as a ProbeError
+    saying why, and are cached too (see _probe_cache_put).
     """
     try:
-        cmd = [
-            "ffprobe",
-            "-v", "quiet",
-            "-print_format", "json",
-            "-show_format",
-            "-show_streams",
-            str(video_path)
-        ]
-        
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
-        
-        if result.returncode != 0:
-            logger.error(f"ffprobe failed: {result.stderr}")
-            return None
-        
-        data = json.loads(result.stdout)
-        
-        # Find video stream
-        video_stream = None
-        for stream in data.get("streams", []):
-            if stream.get("codec_type") == "video":
-                video_stream = stream
-                break
+        key = _probe_key(video_path, st)
+    except OSError as e:
+        return _probe_failed(ProbeError("os", str(e)))
+    outcome = _probe_cache_get(key)
+    if outcome is not None:
+        return outcome
+    
+    outcome = _probe_mp4_fast(*key)
+    if outcome is None:
+        try:
+            # Raw bytes straight into orjson, no str decode in between
+            result = subprocess.run(_ffprobe_cmd(key[0]), capture_output=True, timeout=PROBE_TIMEOUT)
+            outcome = _parse_ffprobe_output(result.returncode, result.stdout, result.stderr, key[2])
+        except subprocess.TimeoutExpired:
+            outcome = ProbeError("timeout", f"ffprobe timed out after {PROBE_TIMEOUT}s")
+        except OSError as e:
+            outcome = ProbeError("os", str(e))
+    return _probe_finished(key, outcome)
+
+
+async def get_video_info_async(video_path: Path, st: Optional[os.stat_result] = None) -> ProbeOutcome:
+    """
+    Extract video metadata using ffprobe without blocking the event loop
+    
+    Same as get_video_info, sharing its cache, but ffprobe runs as an
+    asyncio subprocess instead of holding an executor thread while it works.
+    Only the MP4 header read, which is file I/O, goes to a thread.
+    """
+    try:
+        key = _probe_key(video_path, st)
+    except OSError as e:
+        return _probe_failed(ProbeError("os", str(e)))
+    outcome = _probe_cache_get(key)
+    if outcome is not None:
+        return outcome
+    
+    # The header read can pull in a large moov box; keep it off the loop
+    outcome = await asyncio.to_thread(_probe_mp4_fast, *key)
+    if outcome is None:
+        try:
+            async with _PROBE_SEM:
+                proc = await asyncio.create_subprocess_exec(
+                    *_ffprobe_cmd(key[0]),
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE,
+                    start_new_session=True
+                )
+                try:
+                    stdout, stderr = await asyncio.wait_for(proc.communicate(), PROBE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    await kill_process(proc)
+                    raise
+            outcome = _parse_ffprobe_output(proc.returncode, stdout, stderr, key[2])
+        except asyncio.TimeoutError:
+            outcome = ProbeError("timeout", f"ffprobe timed out after {PROBE_TIMEOUT}s")
+        except OSError as e:
+            outcome = ProbeError("os", str(e))
+    return _probe_finished(key, outcome)
+
+
+def _probe_key(video_path: Path, st: Optional[os.stat_result] = None) -> Tuple[str, int, int]:
+    """Cache key for a video: path, modification time and size"""
+    if st is None:
+        st = video_path.stat()
+    return str(video_path), st.st_mtime_ns, st.st_size
+
+
+def _probe_failed(error: ProbeError) -> ProbeError:
+    """Log a probe failure"""
+    logger.error(f"Failed to get video info ({error.kind}): {error.detail}")
+    return error
+
+
+def _probe_finished(key: Tuple[str, int, int], outcome: ProbeOutcome) -> ProbeOutcome:
+    """Log and cache a fresh probe outcome"""
+    if isinstance(outcome, ProbeError):
+        _probe_failed(outcome)
+    _probe_cache_put(key, outcome)
+    return outcome
+
+
+def _probe_cache_get(key: Tuple[str, int, int]) -> Optional[ProbeOutcome]:
+    """Look up a cached probe, marking it recently used; None if absent or expired"""
+    entry = _probe_cache.get(key)
+    if entry is None:
+        return None
+    outcome, expires = entry
+    if expires is not None and time.monotonic() >= expires:
+        del _probe_cache[key]
+        return None
+    _probe_cache.move_to_end(key)
+    return outcome
+
+
+def _probe_cache_put(key: Tuple[str, int, int], outcome: ProbeOutcome):
+    """
+    Remember a probe outcome
+    
+    Results and definite failures (no stream, ffprobe error, bad output)
+    stay until evicted; the key changes if the file does. Timeouts are kept
+    for PROBE_TIMEOUT_TTL so a burst of retries doesn't re-run a probe that
+    just hung. OS errors (e.g. ffprobe missing) aren't about the file and
+    are never cached.
+    """
+    if isinstance(outcome, ProbeError):
+        if outcome.kind == "os":
+            return
+        expires = time.monotonic() + PROBE_TIMEOUT_TTL if outcome.kind == "timeout" else None
+    else:
+        expires = None
+    _probe_cache[key] = (outcome, expires)
+    _probe_cache.move_to_end(key)
+    while len(_probe_cache) > PROBE_CACHE_SIZE:
+        _probe_cache.popitem(last=False)
+
+
+def _ffprobe_cmd(video_path: str) -> list[str]:
+    """ffprobe command line for a video"""
+    # Only the first video stream and the fields read below, so ffprobe
+    # doesn't describe every audio/subtitle/data stream
+    return [
+        settings.FFPROBE_PATH,
+        "-v", "error",
+        "-select_streams", "v:0",
+        "-show_entries", "stream=width,height,codec_name,r_frame_rate,avg_frame_rate,duration:format=duration",
+        "-print_format", "json",
+        video_path
+    ]
+
+
+def _parse_ffprobe_output(returncode: int, stdout: bytes, stderr: bytes, size: int) -> ProbeOutcome:
+    """Build VideoInfo from a finished ffprobe run; size is the file's stat size"""
+    if returncode != 0:
+        lines = stderr.decode(errors='replace').strip().splitlines()
+        return ProbeError("nonzero", lines[-1] if lines else f"ffprobe exited with code {returncode}")
+    
+    try:
+        data = orjson.loads(stdout)
         
-        if not video_stream:
-            logger.error("No video stream found")
-            return None
+        # -select_streams v:0 leaves at most the first video stream
+        streams = data.get("streams")
+        if not streams:
+            return ProbeError("no_stream", "No video stream found")
+        video_stream = streams[0]
         
         # Extract info
         format_info = data.get("format", {})
         
-        # Parse FPS (can be "30/1" or "29.97")
-        fps_str = video_stream.get("r_frame_rate", "30/1")
-        if "/" in fps_str:
-            num, den = fps_str.split("/")
-            fps = float(num) / float(den) if float(den) > 0 else 30.0
-        else:
-            fps = float(fps_str)
+        # r_frame_rate is "0/0" for some variable frame rate streams; fall back
+        # to the average, and report 0 (low fps warning) rather than guess
+        fps = _parse_rate(video_stream.get("r_frame_rate", "0/0"))
+        if not fps:
+            fps = _parse_rate(video_stream.get("avg_frame_rate", "0/0"))
         
         return VideoInfo(
-            duration=float(format_info.get("duration", 0)),
+            # The stream's own duration comes straight from the track header;
+            # the container's is the fallback (e.g. Matroska/WebM streams lack one)
+            duration=float(video_stream.get("duration") or format_info.get("duration") or 0),
             width=int(video_stream.get("width", 0)),
             height=int(video_stream.get("height", 0)),
             fps=fps,
             codec=video_stream.get("codec_name", "unknown"),
-            file_size=int(format_info.get("size", 0))
+            file_size=size
         )
-        
-    except subprocess.TimeoutExpired:
-        logger.error("ffprobe timed out")
+    except (orjson.JSONDecodeError, AttributeError, TypeError, ValueError) as e:
+        return ProbeError("parse", f"Unexpected ffprobe output: {e}")
+
+
+def _parse_rate(rate: str) -> float:
+    """Parse an ffprobe rate ("30000/1001" or "29.97"); 0.0 for N/0"""
+    num, _, den = rate.partition("/")
+    if not den:
+        return float(num)
+    den_i = int(den)
+    return int(num) / den_i if den_i else 0.0
+
+
+def _probe_mp4_fast(video_path: str, mtime_ns: int, size: int) -> Optional[VideoInfo]:
+    """
+    Read metadata straight from an MP4/MOV header, skipping the ffprobe spawn
+    
+    fps is the average over the track (samples / duration) rather than
+    ffprobe's r_frame_rate, which only differs for variable frame rate
+    video. Returns None when the header can't answer, so ffprobe decides.
+    """
+    if Path(video_path).suffix.lower() not in MP4_EXTENSIONS:
+        return None
+    try:
+        track = read_video_track(Path(video_path))
+    except (OSError, ValueError, struct.error) as e:
+        logger.debug(f"MP4 header parse failed for {video_path}: {e}")
         return None
-    except Exception as e:
-        logger.error(f"Failed to get video info: {e}")
+    if track is None:
         return None
+    
+    return VideoInfo(
+        duration=track.duration,
+        width=track.width,
+        height=track.height,
+        fps=track.fps,
+        codec=track.codec,
+        file_size=size
+    )
 
 
 def validate_video(video_path: Path) -> ValidationResult:
@@ -108,11 +296,47 @@ def validate_video(video_path: Path) -> ValidationResult:
     Returns:
         ValidationResult with valid flag, video info, errors and warnings
     """
-    errors = []
-    warnings = []
+    st = _stat(video_path)
+    result = _check_file(video_path, st)
+    if result is not None:
+        return result
+    return _check_video_info(get_video_info(video_path, st))
+
+
+async def validate_video_async(video_path: Path) -> ValidationResult:
+    """Async video validation; only the ffprobe run leaves the event loop"""
+    st = _stat(video_path)
+    result = _check_file(video_path, st)
+    if result is not None:
+        return result
+    return _check_video_info(await get_video_info_async(video_path, st))
+
+
+async def validate_videos(video_paths: List[Path]) -> List[ValidationResult]:
+    """
+    Validate several videos concurrently, in input order
     
+    Probes run in parallel up to the ffprobe semaphore's limit; a path
+    given more than once is validated once.
+    """
+    unique = list(dict.fromkeys(video_paths))
+    results = await asyncio.gather(*(validate_video_async(p) for p in unique))
+    by_path = dict(zip(unique, results))
+    return [by_path[p] for p in video_paths]
+
+
+def _stat(video_path: Path) -> Optional[os.stat_result]:
+    """stat a video once for both the existence check and the probe cache key"""
+    try:
+        return video_path.stat()
+    except OSError:
+        return None
+
+
+def _check_file(video_path: Path, st: Optional[os.stat_result]) -> Optional[ValidationResult]:
+    """Reject missing, unsupported and oversized files before probing"""
     # Check file exists
-    if not video_path.exists():
+    if st is None:
         return ValidationResult(
             valid=False,
             video_info=None,
@@ -126,18 +350,34 @@ def validate_video(video_path: Path) -> ValidationResult:
         return ValidationResult(
             valid=False,
             video_info=None,
-            errors=[f"Unsupported format: {ext}. Allowed: {', '.join(settings.ALLOWED_EXTENSIONS)}"],
+            errors=[f"Unsupported format: {ext}. Allowed: {settings.allowed_extensions_display}"],
             warnings=[]
         )
     
-    # Get video info
-    video_info = get_video_info(video_path)
+    # Check file size from the stat, so oversized files never reach ffprobe
+    if st.st_size > settings.MAX_UPLOAD_SIZE:
+        return ValidationResult(
+            valid=False,
+            video_info=None,
+            errors=[
+                f"File too large: {st.st_size / (1024*1024):.1f}MB. "
+                f"Maximum: {settings.MAX_UPLOAD_SIZE / (1024*1024):.0f}MB"
+            ],
+            warnings=[]
+        )
+    return None
+
+
+def _check_video_info(video_info: ProbeOutcome) -> ValidationResult:
+    """Apply the duration, resolution and frame rate limits"""
+    errors = []
+    warnings = []
     
-    if not video_info:
+    if isinstance(video_info, ProbeError):
         return ValidationResult(
             valid=False,
             video_info=None,
-            errors=["Could not read video file. File may be corrupted."],
+            errors=[f"Could not read video file ({video_info.kind}): {video_info.detail}"],
             warnings=[]
         )
     
@@ -187,13 +427,6 @@ def validate_video(video_path: Path) -> ValidationResult:
             f"frames will be sampled for efficiency"
         )
     
-    # Check file size
-    if video_info.file_size > settings.MAX_UPLOAD_SIZE:
-        errors.append(
-            f"File too large: {video_info.file_size / (1024*1024):.1f}MB. "
-            f"Maximum: {settings.MAX_UPLOAD_SIZE / (1024*1024):.0f}MB"
-        )
-    
     # Estimate processing time and frames
     estimated_frames = int(video_info.duration * 2)  # At 2 FPS
     if estimated_frames < 10:
@@ -215,10 +448,3 @@ def validate_video(video_path: Path) -> ValidationResult:
         warnings=warnings
     )
 
-
-async def validate_video_async(video_path: Path) -> ValidationResult:
-    """Async wrapper for video validation"""
-    import asyncio
-    return await asyncio.get_event_loop().run_in_executor(
-        None, validate_video, video_path
-    )
@@ -0,0 +1,86 @@
+"""
+Tests for content negotiation in the model download endpoint
+"""
+import tempfile
+import unittest
+from datetime import datetime
+from pathlib import Path
+from unittest import mock
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api import jobs
+from core.models import Job, JobStatus
+
+JOB_ID = "job-1"
+MODEL_FILENAME = f"{JOB_ID}.ply"
+RAW = b"ply\nformat binary_little_endian 1.0\nend_header\n" + bytes(range(256)) * 16
+GZ = b"\x1f\x8b fake gzip body"
+ZST = b"\x28\xb5\x2f\xfd fake zstd body"
+
+
+class ModelDownloadTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.models_dir = Path(tmp.name)
+        (self.models_dir / MODEL_FILENAME).write_bytes(RAW)
+        (self.models_dir / (MODEL_FILENAME + ".gz")).write_bytes(GZ)
+        (self.models_dir / (MODEL_FILENAME + ".zst")).write_bytes(ZST)
+        
+        now = datetime.now()
+        job = Job(
+            job_id=JOB_ID, status=JobStatus.COMPLETED, video_filename="v.mp4",
+            created_at=now, updated_at=now, model_filename=MODEL_FILENAME
+        )
+        self._patch(jobs.settings, "MODELS_DIR", self.models_dir)
+        self._patch(jobs.settings, "ACCEL_REDIRECT_PREFIX", None)
+        self._patch(jobs.job_manager, "get_job", mock.AsyncMock(return_value=job))
+        
+        app = FastAPI()
+        app.include_router(jobs.router, prefix="/api/jobs")
+        self.client = TestClient(app)
+    
+    def _patch(self, target, attribute, value):
+        patcher = mock.patch.object(target, attribute, value)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    def _get(self, **headers):
+        return self.client.get(f"/api/jobs/{JOB_ID}/model", headers=headers)
+    
+    def test_negotiates_zstd(self):
+        response = self._get(**{"Accept-Encoding": "gzip, zstd"})
+        self.assertEqual(response.headers["content-encoding"], "zstd")
+        self.assertEqual(response.headers["vary"], "Accept-Encoding")
+    
+    def test_raw_without_accept_encoding(self):
+        response = self._get(**{"Accept-Encoding": "identity"})
+        self.assertNotIn("content-encoding", response.headers)
+        self.assertEqual(response.content, RAW)
+        self.assertEqual(response.headers["accept-ranges"], "bytes")
+    
+    def test_encoded_copy_does_not_advertise_ranges(self):
+        # Ranges are served from the raw PLY, not the negotiated copy
+        response = self._get(**{"Accept-Encoding": "zstd"})
+        self.assertEqual(response.headers["content-encoding"], "zstd")
+        self.assertEqual(response.headers["accept-ranges"], "none")
+    
+    def test_range_served_from_raw_ply(self):
+        response = self._get(**{"Accept-Encoding": "zstd", "Range": "bytes=0-2"})
+        self.assertEqual(response.status_code, 206)
+        self.assertNotIn("content-encoding", response.headers)
+        self.assertEqual(response.content, RAW[:3])
+    
+    def test_accel_redirect_never_sends_encoded_copy(self):
+        # nginx drops Content-Encoding on X-Accel-Redirect responses, so the
+        # encoded copy would reach the client unlabelled
+        self._patch(jobs.settings, "ACCEL_REDIRECT_PREFIX", "/internal/models")
+        response = self._get(**{"Accept-Encoding": "gzip, zstd"})
+        self.assertEqual(response.headers["x-accel-redirect"], f"/internal/models/{MODEL_FILENAME}")
+        self.assertNotIn("content-encoding", response.headers)
+
+
+if __name__ == "__main__":
+    unittest.main()
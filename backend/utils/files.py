@@ -0,0 +1,40 @@
+"""
+File copy helpers for large model files
+"""
+import errno
+import os
+import shutil
+from pathlib import Path
+
+# Largest span handed to a single copy_file_range call
+_COPY_CHUNK = 1 << 30
+
+# errnos meaning copy_file_range can't be used for this pair of files
+_UNSUPPORTED_COPY_ERRNOS = frozenset({
+    errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.EBADF
+})
+
+
+def fast_copy(src: Path, dst: Path):
+    """
+    Copy src to dst inside the kernel where possible
+    
+    Uses copy_file_range on Linux, so the data never passes through user
+    space and filesystems that support it can share extents instead of
+    writing new blocks. Falls back to shutil.copyfile (sendfile on Linux)
+    when copy_file_range isn't available for these files.
+    """
+    if not hasattr(os, "copy_file_range"):
+        shutil.copyfile(src, dst)
+        return
+    
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        try:
+            while os.copy_file_range(fsrc.fileno(), fdst.fileno(), _COPY_CHUNK):
+                pass
+            return
+        except OSError as e:
+            if e.errno not in _UNSUPPORTED_COPY_ERRNOS:
+                raise
+    # Nothing was written, or it is overwritten from the start
+    shutil.copyfile(src, dst)
@@ -0,0 +1,169 @@
+"""
+Minimal ISO base media (MP4/MOV) box parsing for reading video metadata
+"""
+import os
+import struct
+from pathlib import Path
+from typing import Iterator, NamedTuple, Optional, Tuple
+
+# Sample entry fourccs -> ffprobe codec names
+_CODECS = {
+    b"avc1": "h264", b"avc3": "h264",
+    b"hvc1": "hevc", b"hev1": "hevc",
+    b"av01": "av1",
+    b"vp09": "vp9",
+    b"mp4v": "mpeg4",
+}
+
+# moov boxes larger than this are left to ffprobe rather than read whole
+_MAX_MOOV_SIZE = 64 * 1024 * 1024
+
+
+class Mp4VideoTrack(NamedTuple):
+    """Metadata of the first video track in an MP4/MOV file"""
+    duration: float  # seconds (movie duration)
+    width: int
+    height: int
+    fps: float  # average: samples / track duration
+    codec: str
+
+
+def _iter_boxes(data: bytes, start: int = 0, end: Optional[int] = None) -> Iterator[Tuple[bytes, int, int]]:
+    """
+    Yield (type, payload start, payload end) for the boxes in data[start:end]
+    
+    Raises:
+        ValueError: If a box header is truncated or inconsistent
+    """
+    end = len(data) if end is None else end
+    pos = start
+    while pos + 8 <= end:
+        size, box_type = struct.unpack_from(">I4s", data, pos)
+        header = 8
+        if size == 1:
+            if pos + 16 > end:
+                raise ValueError("truncated box header")
+            size = struct.unpack_from(">Q", data, pos + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header or pos + size > end:
+            raise ValueError(f"bad size for box {box_type!r}")
+        yield box_type, pos + header, pos + size
+        pos += size
+
+
+def _find_box(data: bytes, start: int, end: int, box_type: bytes) -> Optional[Tuple[int, int]]:
+    """Return the payload span of the first child box of the given type"""
+    for child_type, child_start, child_end in _iter_boxes(data, start, end):
+        if child_type == box_type:
+            return child_start, child_end
+    return None
+
+
+def _read_moov(video_path: Path) -> Optional[bytes]:
+    """Read the moov box by seeking over the other top-level boxes"""
+    with open(video_path, "rb") as f:
+        file_size = os.fstat(f.fileno()).st_size
+        pos = 0
+        while pos + 8 <= file_size:
+            f.seek(pos)
+            header = f.read(16)
+            size, box_type = struct.unpack_from(">I4s", header)
+            header_size = 8
+            if size == 1:
+                size = struct.unpack_from(">Q", header, 8)[0]
+                header_size = 16
+            elif size == 0:
+                size = file_size - pos
+            if size < header_size:
+                return None
+            if box_type == b"moov":
+                if size > _MAX_MOOV_SIZE or pos + size > file_size:
+                    return None
+                f.seek(pos)
+                return f.read(size)
+            pos += size
+    return None
+
+
+def _full_box_times(data: bytes, start: int) -> Tuple[int, int]:
+    """(timescale, duration) from an mvhd or mdhd payload"""
+    if data[start] == 1:
+        return struct.unpack_from(">IQ", data, start + 20)
+    return struct.unpack_from(">II", data, start + 12)
+
+
+def read_video_track(video_path: Path) -> Optional[Mp4VideoTrack]:
+    """
+    Read duration, dimensions, frame rate and codec from an MP4/MOV header.
+    
+    Only the moov box is read; no sample data is touched. Returns None when
+    the file has no usable moov (e.g. fragmented MP4), no video track, or a
+    codec this parser doesn't name, so the caller can fall back to ffprobe.
+    
+    Raises:
+        ValueError: If the boxes are malformed
+    """
+    moov = _read_moov(video_path)
+    if moov is None:
+        return None
+    moov_start, moov_end = 8, len(moov)
+    if struct.unpack_from(">I", moov)[0] == 1:
+        moov_start = 16
+    
+    mvhd = _find_box(moov, moov_start, moov_end, b"mvhd")
+    if mvhd is None:
+        return None
+    movie_timescale, movie_duration = _full_box_times(moov, mvhd[0])
+    if not movie_timescale or not movie_duration:
+        return None
+    
+    for box_type, trak_start, trak_end in _iter_boxes(moov, moov_start, moov_end):
+        if box_type != b"trak":
+            continue
+        mdia = _find_box(moov, trak_start, trak_end, b"mdia")
+        if mdia is None:
+            continue
+        hdlr = _find_box(moov, *mdia, b"hdlr")
+        # hdlr payload: version/flags(4) pre_defined(4) handler_type(4)
+        if hdlr is None or moov[hdlr[0] + 8:hdlr[0] + 12] != b"vide":
+            continue
+        
+        mdhd = _find_box(moov, *mdia, b"mdhd")
+        minf = _find_box(moov, *mdia, b"minf")
+        stbl = _find_box(moov, *minf, b"stbl") if minf else None
+        if mdhd is None or stbl is None:
+            return None
+        stsd = _find_box(moov, *stbl, b"stsd")
+        stts = _find_box(moov, *stbl, b"stts")
+        if stsd is None or stts is None:
+            return None
+        
+        # stsd payload: version/flags(4) entry_count(4), then the first
+        # VisualSampleEntry: size(4) format(4) reserved(6) data_ref(2)
+        # pre_defined/reserved(16) width(2) height(2)
+        entry = stsd[0] + 8
+        codec = _CODECS.get(moov[entry + 4:entry + 8])
+        if codec is None:
+            return None
+        width, height = struct.unpack_from(">HH", moov, entry + 32)
+        
+        # stts payload: version/flags(4) entry_count(4) (count, delta)*
+        entry_count = struct.unpack_from(">I", moov, stts[0] + 4)[0]
+        sample_count = sum(
+            struct.unpack_from(">I", moov, stts[0] + 8 + 8 * i)[0]
+            for i in range(entry_count)
+        )
+        track_timescale, track_duration = _full_box_times(moov, mdhd[0])
+        if not track_timescale or not track_duration or not sample_count:
+            return None
+        
+        return Mp4VideoTrack(
+            duration=movie_duration / movie_timescale,
+            width=width,
+            height=height,
+            fps=sample_count * track_timescale / track_duration,
+            codec=codec,
+        )
+    return None
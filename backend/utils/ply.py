@@ -0,0 +1,115 @@
+"""
+Minimal binary PLY header parsing for reading vertex data with NumPy
+"""
+from pathlib import Path
+from typing import NamedTuple, Optional
+import numpy as np
+
+# PLY property types -> NumPy type codes (byte order is added per file)
+_PLY_TYPES = {
+    "char": "i1", "int8": "i1",
+    "uchar": "u1", "uint8": "u1",
+    "short": "i2", "int16": "i2",
+    "ushort": "u2", "uint16": "u2",
+    "int": "i4", "int32": "i4",
+    "uint": "u4", "uint32": "u4",
+    "float": "f4", "float32": "f4",
+    "double": "f8", "float64": "f8",
+}
+
+_BYTE_ORDERS = {
+    "binary_little_endian": "<",
+    "binary_big_endian": ">",
+}
+
+
+class PlyVertexLayout(NamedTuple):
+    """Where and how the vertex element is stored in a binary PLY"""
+    count: int
+    dtype: np.dtype
+    offset: int  # Byte offset of the first vertex record
+
+
+def read_vertex_layout(ply_path: Path) -> PlyVertexLayout:
+    """
+    Parse a binary PLY header into the vertex element's layout.
+    
+    Supports files whose first element is "vertex" with scalar properties,
+    which is what Gaussian Splatting exports write.
+    
+    Raises:
+        ValueError: If the file is ASCII, malformed or has another layout
+    """
+    with open(ply_path, 'rb') as f:
+        if f.readline().strip() != b"ply":
+            raise ValueError(f"{ply_path} is not a PLY file")
+        
+        byte_order = None
+        elements = []  # [name, count, [property words]]
+        while True:
+            line = f.readline()
+            if not line:
+                raise ValueError(f"{ply_path}: unterminated PLY header")
+            words = line.decode("ascii").split()
+            if not words or words[0] in ("comment", "obj_info"):
+                continue
+            if words[0] == "end_header":
+                break
+            if words[0] == "format":
+                if words[1] not in _BYTE_ORDERS:
+                    raise ValueError(f"{ply_path}: unsupported PLY format '{words[1]}'")
+                byte_order = _BYTE_ORDERS[words[1]]
+            elif words[0] == "element":
+                elements.append([words[1], int(words[2]), []])
+            elif words[0] == "property":
+                if not elements:
+                    raise ValueError(f"{ply_path}: property before element")
+                elements[-1][2].append(words[1:])
+        offset = f.tell()
+    
+    if byte_order is None or not elements or elements[0][0] != "vertex":
+        raise ValueError(f"{ply_path}: expected a binary PLY starting with a vertex element")
+    
+    _, count, properties = elements[0]
+    fields = []
+    for prop in properties:
+        if len(prop) != 2 or prop[0] not in _PLY_TYPES:
+            raise ValueError(f"{ply_path}: unsupported vertex property '{' '.join(prop)}'")
+        fields.append((prop[1], byte_order + _PLY_TYPES[prop[0]]))
+    dtype = np.dtype(fields)
+    return PlyVertexLayout(count, dtype, offset)
+
+
+def open_vertices(ply_path: Path, mode: str = "r") -> np.memmap:
+    """
+    Memory-map the vertex records of a binary PLY as a structured array.
+    
+    Pages are read on access, so only the fields actually used are loaded.
+    """
+    layout = read_vertex_layout(ply_path)
+    return np.memmap(
+        ply_path, dtype=layout.dtype, mode=mode,
+        offset=layout.offset, shape=(layout.count,)
+    )
+
+
+def as_xyz_view(vertices: np.ndarray) -> Optional[np.ndarray]:
+    """
+    View the x, y, z fields of structured vertices as one (N, 3) array.
+    
+    No data is copied and writes go straight to the records. Returns None
+    unless the three fields share a dtype and are stored back to back, as
+    in Gaussian Splatting PLYs.
+    """
+    fields = vertices.dtype.fields
+    if fields is None or not all(axis in fields for axis in ("x", "y", "z")):
+        return None
+    (x_type, x_offset), (y_type, y_offset), (z_type, z_offset) = (
+        fields[axis][:2] for axis in ("x", "y", "z")
+    )
+    size = x_type.itemsize
+    if not (x_type == y_type == z_type and y_offset == x_offset + size and z_offset == y_offset + size):
+        return None
+    return np.lib.stride_tricks.as_strided(
+        vertices["x"], shape=(len(vertices), 3), strides=(vertices.strides[0], size)
+    )
@@ -5,17 +5,77 @@ import asyncio
 import logging
 import subprocess
 import os
+import signal
 from pathlib import Path
+from types import MappingProxyType
 
 logger = logging.getLogger(__name__)
 
 from typing import Optional, List, Dict
 
-# Environment variables to pass to all subprocesses
-SUBPROCESS_ENV = {
+# Environment variables to pass to all subprocesses, captured once at import.
+# Read-only: pass env= to run_command for overrides instead of mutating it.
+_SUBPROCESS_ENV = {
     **os.environ,
     "QT_QPA_PLATFORM": "offscreen",  # Headless rendering mode
 }
+SUBPROCESS_ENV = MappingProxyType(_SUBPROCESS_ENV)
+
+# Seconds a timed-out process gets to exit after SIGTERM before SIGKILL
+KILL_GRACE_PERIOD = 5
+
+
+def _signal_tree(process: asyncio.subprocess.Process, sig: int):
+    """Signal the process group a child leads, or just the child otherwise"""
+    try:
+        os.killpg(process.pid, sig)
+    except ProcessLookupError:
+        # Not a group leader (not started with start_new_session), or gone
+        try:
+            process.send_signal(sig)
+        except ProcessLookupError:
+            pass
+
+
+async def kill_process(process: asyncio.subprocess.Process):
+    """
+    Stop a child process, and any processes it started, then reap it
+    
+    asyncio.wait_for cancelling communicate() leaves the child running, so
+    timed-out commands must be stopped explicitly or they pile up. Start the
+    child with start_new_session=True so its whole tree can be signalled;
+    a grandchild holding the output pipes would otherwise keep wait() from
+    returning.
+    """
+    if process.returncode is None:
+        _signal_tree(process, signal.SIGTERM)
+        try:
+            await asyncio.wait_for(process.wait(), timeout=KILL_GRACE_PERIOD)
+            return
+        except asyncio.TimeoutError:
+            pass
+    _signal_tree(process, signal.SIGKILL)
+    await process.wait()
+
+
+async def _drain(stream: asyncio.StreamReader, buf: bytearray, label: str):
+    """Read a child's output line by line into buf, logging lines at DEBUG as they arrive"""
+    log_lines = logger.isEnabledFor(logging.DEBUG)
+    while True:
+        try:
+            line = await stream.readuntil(b"\n")
+        except asyncio.IncompleteReadError as e:
+            # EOF; keep whatever trailing output had no newline
+            line = e.partial
+        except asyncio.LimitOverrunError as e:
+            # No newline within the reader's limit (e.g. \r progress output)
+            line = await stream.read(e.consumed)
+        if not line:
+            return
+        buf += line
+        if log_lines:
+            logger.debug(f"[{label}] {line.decode('utf-8', errors='replace').rstrip()}")
+
 
 async def run_command(
     cmd: List[str],
@@ -40,8 +100,9 @@ async def run_command(
     """
     logger.debug(f"Running command: {' '.join(cmd)}")
     
-    # Use provided env or default to SUBPROCESS_ENV
-    command_env = env if env is not None else SUBPROCESS_ENV
+    # Use provided env or default to the dict behind SUBPROCESS_ENV; the same
+    # object every call, since the child gets its own copy at exec
+    command_env = env if env is not None else _SUBPROCESS_ENV
     
     try:
         process = await asyncio.create_subprocess_exec(
@@ -49,16 +110,32 @@ async def run_command(
             stdout=asyncio.subprocess.PIPE,
             stderr=asyncio.subprocess.PIPE,
             cwd=str(cwd) if cwd else None,
-            env=command_env
+            env=command_env,
+            # Own process group, so a timeout can kill everything it spawned
+            start_new_session=True
         )
         
-        stdout, stderr = await asyncio.wait_for(
-            process.communicate(),
-            timeout=timeout
-        )
+        # Drain both pipes concurrently as output arrives, so long ffmpeg
+        # runs show up in the debug log live instead of all at exit
+        stdout, stderr = bytearray(), bytearray()
+        label = Path(cmd[0]).name
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(
+                    _drain(process.stdout, stdout, label),
+                    _drain(process.stderr, stderr, label),
+                    process.wait()
+                ),
+                timeout=timeout
+            )
+        except asyncio.TimeoutError:
+            await kill_process(process)
+            raise
         
-        stdout_str = stdout.decode('utf-8')
-        stderr_str = stderr.decode('utf-8')
+        # Tools print whatever bytes are in file names and metadata; never
+        # fail a finished command over undecodable output
+        stdout_str = stdout.decode('utf-8', errors='replace')
+        stderr_str = stderr.decode('utf-8', errors='replace')
         
         if process.returncode != 0:
             logger.error(f"Command failed with return code {process.returncode}")
@@ -38,6 +38,43 @@ export const getJobStatus = async (jobId: string): Promise<JobStatusResponse> =>
   return response.data;
 };
 
+// Subscribe to pushed status updates. onFailure fires if the socket closes
+// before the job reaches a terminal state, so callers can fall back to polling.
+export const subscribeJobStatus = (
+  jobId: string,
+  onUpdate: (status: JobStatusResponse) => void,
+  onFailure: () => void
+): (() => void) => {
+  const wsUrl = `${API_JOBS_URL.replace(/^http/, 'ws')}/${jobId}/ws`;
+  let closedByClient = false;
+  let lastStatus: string | null = null;
+  let socket: WebSocket;
+
+  try {
+    socket = new WebSocket(wsUrl);
+  } catch {
+    onFailure();
+    return () => {};
+  }
+
+  socket.onmessage = (event) => {
+    const data: JobStatusResponse = JSON.parse(event.data);
+    lastStatus = data.status;
+    onUpdate(data);
+  };
+
+  socket.onclose = () => {
+    if (!closedByClient && lastStatus !== 'completed' && lastStatus !== 'error') {
+      onFailure();
+    }
+  };
+
+  return () => {
+    closedByClient = true;
+    socket.close();
+  };
+};
+
 export const downloadModel = async (jobId: string, compressed: boolean = false): Promise<Blob> => {
   const url = compressed 
     ? `${API_JOBS_URL}/${jobId}/model?compressed=true`
@@ -1,6 +1,6 @@
-import { useEffect, useState } from 'react';
+import { useEffect, useRef, useState } from 'react';
 import { JobStatus as JobStatusEnum, JobStatusResponse } from '../types/job';
-import { getJobStatus, downloadModel } from '../api/jobs';
+import { getJobStatus, subscribeJobStatus, downloadModel } from '../api/jobs';
 
 interface JobStatusProps {
   jobId: string;
@@ -33,6 +33,12 @@ export default function JobStatus({ jobId, onComplete }: JobStatusProps) {
   const [estimatedMinutes, setEstimatedMinutes] = useState<number | null>(null);
   const [startTime] = useState<Date>(new Date());
   const [elapsedTime, setElapsedTime] = useState<string>('0:00');
+  // Latest onComplete, so a new callback from the parent doesn't reopen the socket
+  const onCompleteRef = useRef(onComplete);
+
+  useEffect(() => {
+    onCompleteRef.current = onComplete;
+  }, [onComplete]);
 
   // Update elapsed time every second
   useEffect(() => {
@@ -51,35 +57,56 @@ export default function JobStatus({ jobId, onComplete }: JobStatusProps) {
   }, [startTime, status]);
 
   useEffect(() => {
-    if (status === JobStatusEnum.COMPLETED || status === JobStatusEnum.ERROR) {
-      return;
-    }
+    let interval: ReturnType<typeof setInterval> | undefined;
+    let finished = false;
 
-    const interval = setInterval(async () => {
-      try {
-        const response: JobStatusResponse = await getJobStatus(jobId);
-        setStatus(response.status);
-        setProgress(response.progress);
-        setError(response.error_message || null);
-        
-        if (response.quality_preset) {
-          setQualityPreset(response.quality_preset);
-        }
-        if (response.estimated_minutes) {
-          setEstimatedMinutes(response.estimated_minutes);
-        }
+    const applyUpdate = (response: JobStatusResponse) => {
+      setStatus(response.status);
+      setProgress(response.progress);
+      setError(response.error_message || null);
+      
+      if (response.quality_preset) {
+        setQualityPreset(response.quality_preset);
+      }
+      if (response.estimated_minutes) {
+        setEstimatedMinutes(response.estimated_minutes);
+      }
 
-        if (response.status === JobStatusEnum.COMPLETED && response.model_url) {
-          onComplete(response.model_url);
-          clearInterval(interval);
-        }
-      } catch (err) {
-        console.error('Error fetching job status:', err);
+      if (response.status === JobStatusEnum.COMPLETED && response.model_url) {
+        finished = true;
+        onCompleteRef.current(response.model_url);
+      } else if (response.status === JobStatusEnum.ERROR) {
+        finished = true;
+      }
+    };
+
+    const startPolling = () => {
+      if (interval || finished) {
+        return;
       }
-    }, 2000); // Poll every 2 seconds
 
-    return () => clearInterval(interval);
-  }, [jobId, status, onComplete]);
+      interval = setInterval(async () => {
+        try {
+          applyUpdate(await getJobStatus(jobId));
+          if (finished) {
+            clearInterval(interval);
+          }
+        } catch (err) {
+          console.error('Error fetching job status:', err);
+        }
+      }, 2000); // Poll every 2 seconds
+    };
+
+    // Prefer pushed updates; fall back to polling if the socket fails
+    const unsubscribe = subscribeJobStatus(jobId, applyUpdate, startPolling);
+
+    return () => {
+      unsubscribe();
+      if (interval) {
+        clearInterval(interval);
+      }
+    };
+  }, [jobId]);
 
   const handleDownload = async (compressed: boolean = false) => {
     setDownloading(true);